@@ -0,0 +1,83 @@
+"""
+Action Plan - Routed actions as a small DAG executed on a thread pool
+Independent steps (e.g. a BigQuery and a GCS action) run concurrently, a step
+starts once every step it depends on has finished, and each step has its own
+timeout. Outcomes come back in plan order regardless of completion order.
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+
+# run(inputs) gets {dependency name: its result}; timeout is in seconds, None for the plan default
+PlanStep = namedtuple("PlanStep", ["name", "run", "depends_on", "timeout"])
+
+
+class ActionPlan:
+    def __init__(self):
+        self.steps = []   # plan order; dependencies always precede their dependents
+
+    def add(self, name, run, depends_on=(), timeout=None):
+        """Append a step; dependencies must already be in the plan, which keeps it acyclic"""
+        names = {step.name for step in self.steps}
+        if name in names:
+            raise ValueError(f"Duplicate plan step: {name}")
+        missing = [dependency for dependency in depends_on if dependency not in names]
+        if missing:
+            raise ValueError(f"Step {name} depends on unknown steps: {missing}")
+        self.steps.append(PlanStep(name, run, tuple(depends_on), timeout))
+        return name
+
+    @staticmethod
+    def _run(step, inputs, started):
+        start = started[step.name] = time.monotonic()
+        try:
+            outcome = {"success": True, "result": step.run(inputs)}
+        except Exception as e:
+            outcome = {"success": False, "error": str(e)}
+        outcome["elapsed_ms"] = round((time.monotonic() - start) * 1000, 1)
+        return outcome
+
+    def execute(self, executor, default_timeout=30.0):
+        """
+        Run the plan on executor; returns {step name: outcome} in plan order. An outcome is
+        {"success", "result" or "error", "elapsed_ms"}. A step whose dependency failed or
+        timed out is skipped. A timed-out step's thread cannot be stopped - it finishes in
+        the background and its result is discarded.
+        """
+        outcomes = {}
+        waiting = list(self.steps)
+        running = {}   # future -> step
+        started = {}   # step name -> start time, set by the worker thread
+
+        while waiting or running:
+            for step in list(waiting):
+                if any(dependency not in outcomes for dependency in step.depends_on):
+                    continue
+                waiting.remove(step)
+                failed = [dependency for dependency in step.depends_on if not outcomes[dependency]["success"]]
+                if failed:
+                    outcomes[step.name] = {"success": False, "error": f"Skipped: {', '.join(failed)} failed",
+                                           "elapsed_ms": 0.0}
+                    continue
+                inputs = {dependency: outcomes[dependency]["result"] for dependency in step.depends_on}
+                running[executor.submit(self._run, step, inputs, started)] = step
+            if not running:
+                continue
+
+            # Deadlines count from when a step starts, not from when it was queued
+            now = time.monotonic()
+            deadlines = {future: started.get(step.name, now) + (step.timeout or default_timeout)
+                         for future, step in running.items()}
+            done, _ = wait(running, timeout=max(0.0, min(deadlines.values()) - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                outcomes[running.pop(future).name] = future.result()
+
+            now = time.monotonic()
+            for future, step in list(running.items()):
+                timeout = step.timeout or default_timeout
+                if step.name in started and now >= started[step.name] + timeout:
+                    del running[future]
+                    outcomes[step.name] = {"success": False, "error": f"Timed out after {timeout}s",
+                                           "elapsed_ms": round((now - started[step.name]) * 1000, 1)}
+
+        return {step.name: outcomes[step.name] for step in self.steps}
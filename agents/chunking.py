@@ -0,0 +1,94 @@
+"""
+Chunking - Streaming, bounded-memory document chunker for RAG ingestion
+Accepts strings, bytes, file-like objects (text or binary, e.g. a GCS blob
+opened for reading) and iterables of text/bytes blocks
+"""
+import codecs
+import hashlib
+from collections import namedtuple
+
+# start/end are character offsets into the decoded document, kept for citations.
+# final marks the last chunk; every other chunk shares `overlap` trailing
+# characters with the next one.
+Chunk = namedtuple("Chunk", ["index", "start", "end", "text", "final"])
+
+
+def _decode_blocks(blocks, encoding):
+    """Decode a stream of bytes/str blocks without splitting multi-byte characters"""
+    decoder = None
+    for block in blocks:
+        if isinstance(block, str):
+            yield block
+            continue
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        yield decoder.decode(block)
+    if decoder is not None:
+        yield decoder.decode(b"", final=True)
+
+
+def iter_text_blocks(source, block_size, encoding="utf-8"):
+    """Yield the source as decoded text blocks of roughly block_size characters"""
+    if isinstance(source, str):
+        blocks = (source[i:i + block_size] for i in range(0, len(source), block_size))
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        blocks = (view[i:i + block_size].tobytes() for i in range(0, len(view), block_size))
+    elif hasattr(source, "read"):
+        blocks = iter(lambda: source.read(block_size), source.read(0))
+    else:
+        blocks = iter(source)
+    return _decode_blocks(blocks, encoding)
+
+
+def content_digest(source, block_size=1 << 20):
+    """
+    SHA-256 of the document's UTF-8 bytes, used to skip unchanged documents.
+    Seekable streams are hashed in blocks and rewound; returns None for sources
+    that cannot be read twice.
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, str):
+        digest.update(source.encode("utf-8"))
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif hasattr(source, "read") and getattr(source, "seekable", lambda: False)():
+        position = source.tell()
+        for block in iter(lambda: source.read(block_size), source.read(0)):
+            digest.update(block.encode("utf-8") if isinstance(block, str) else block)
+        source.seek(position)
+    else:
+        return None
+    return digest.hexdigest()
+
+
+def iter_chunks(source, chunk_size=2000, overlap=200, encoding="utf-8"):
+    """Yield overlapping Chunks while holding at most about two chunks of text in memory"""
+    if chunk_size <= 0 or not 0 <= overlap < chunk_size:
+        raise ValueError("chunk_size must be positive and overlap must be in [0, chunk_size)")
+
+    blocks = iter_text_blocks(source, chunk_size, encoding)
+    step = chunk_size - overlap
+    buffer = ""
+    start = 0
+    index = 0
+    exhausted = False
+
+    while True:
+        # Read until we know whether more text follows the current chunk
+        while not exhausted and len(buffer) <= chunk_size:
+            block = next(blocks, None)
+            if block is None:
+                exhausted = True
+            else:
+                buffer += block
+
+        if exhausted and len(buffer) <= chunk_size:
+            if buffer or index == 0:
+                yield Chunk(index, start, start + len(buffer), buffer, True)
+            return
+
+        yield Chunk(index, start, start + chunk_size, buffer[:chunk_size], False)
+        buffer = buffer[step:]
+        start += step
+        index += 1
@@ -0,0 +1,190 @@
+"""
+Dedup - MinHash signatures and LSH banding for near-duplicate documents
+Signatures are built while a document streams through chunking; the LSH index
+only compares a new document against canonical documents sharing a band bucket.
+
+Modes for a detected near-duplicate:
+    link      index it as usual, but retrieval returns one document per cluster
+    collapse  keep its record (entities, stats) but index none of its chunks
+    skip      index nothing; only remember it so unchanged copies are not re-read
+"""
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from agents.snapshot import StringTable, pack_strings
+from agents.text_index import TOKEN_PATTERN
+
+DUPLICATE_MODES = ("link", "collapse", "skip")
+
+# Signatures use universal hashing (a * x + b) mod p; p < 2^31 keeps a * x inside uint64
+MINHASH_PRIME = (1 << 31) - 1
+MINHASH_BLOCK = 4096   # shingles hashed per step, bounds the (num_perm, block) scratch matrix
+
+Duplicate = namedtuple("Duplicate", ["canonical", "similarity", "digest", "generation", "mode"])
+
+
+class MinHasher:
+    def __init__(self, num_perm=128, shingle_size=5, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, MINHASH_PRIME, num_perm).astype(np.uint64)[:, None]
+        self._b = rng.randint(0, MINHASH_PRIME, num_perm).astype(np.uint64)[:, None]
+
+    def empty(self):
+        return np.full(self.num_perm, MINHASH_PRIME, dtype=np.uint32)
+
+    def update(self, signature, text):
+        """Fold the word shingles of a piece of text (e.g. one chunk) into the signature in place"""
+        words = TOKEN_PATTERN.findall(text.lower())
+        size = min(self.shingle_size, len(words))
+        if not size:
+            return signature
+        hashes = np.fromiter((zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+                              for i in range(len(words) - size + 1)), dtype=np.uint64)
+        for start in range(0, len(hashes), MINHASH_BLOCK):
+            block = hashes[None, start:start + MINHASH_BLOCK]
+            np.minimum(signature, ((self._a * block + self._b) % MINHASH_PRIME).min(axis=1), out=signature)
+        return signature
+
+    def signature(self, text):
+        return self.update(self.empty(), text)
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the two documents' shingle sets"""
+    return float(np.count_nonzero(signature == other)) / len(signature)
+
+
+def lsh_params(threshold, num_perm):
+    """(bands, rows) whose S-curve midpoint (1/bands)^(1/rows) lies closest to the threshold"""
+    return min(((num_perm // rows, rows) for rows in range(1, num_perm + 1)),
+               key=lambda params: abs((1.0 / params[0]) ** (1.0 / params[1]) - threshold))
+
+
+class NearDuplicateIndex:
+    def __init__(self, threshold=0.85, minhasher=None):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"Duplicate threshold must be in (0, 1]: {threshold}")
+        self.threshold = threshold
+        self.minhasher = minhasher or MinHasher()
+        self.bands, self.rows = lsh_params(threshold, self.minhasher.num_perm)
+        self.signatures = {}   # canonical doc_name -> signature
+        self.buckets = {}      # (band, band bytes) -> canonical doc names
+        self.duplicates = {}   # doc_name -> Duplicate
+        self.members = {}      # canonical doc_name -> tuple of its duplicates
+        self._owned = None     # buckets this copy may write; None = all of them
+
+    def __len__(self):
+        return len(self.duplicates)
+
+    def __contains__(self, doc_name):
+        return doc_name in self.duplicates
+
+    def get(self, doc_name):
+        return self.duplicates.get(doc_name)
+
+    def copy(self):
+        """Copy for a new knowledge generation; bucket sets are copied on first write"""
+        clone = NearDuplicateIndex(self.threshold, self.minhasher)
+        clone.signatures = dict(self.signatures)
+        clone.buckets = dict(self.buckets)
+        clone.duplicates = dict(self.duplicates)
+        clone.members = dict(self.members)
+        clone._owned = set()
+        return clone
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _writable_bucket(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = set()
+        elif self._owned is None or key in self._owned:
+            return bucket
+        else:
+            bucket = self.buckets[key] = set(bucket)
+        if self._owned is not None:
+            self._owned.add(key)
+        return bucket
+
+    def add_canonical(self, doc_name, signature):
+        self.signatures[doc_name] = signature
+        for key in self._band_keys(signature):
+            self._writable_bucket(key).add(doc_name)
+
+    def add_duplicate(self, doc_name, duplicate):
+        self.duplicates[doc_name] = duplicate
+        self.members[duplicate.canonical] = self.members.get(duplicate.canonical, ()) + (doc_name,)
+
+    def find(self, signature):
+        """Most similar canonical document at or above the threshold -> (doc_name, similarity), or None"""
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates |= self.buckets.get(key, set())
+        best = None
+        for doc_name in candidates:
+            score = similarity(signature, self.signatures[doc_name])
+            if score >= self.threshold and (best is None or (-score, doc_name) < (-best[1], best[0])):
+                best = (doc_name, score)
+        return best
+
+    def canonical(self, doc_name):
+        duplicate = self.duplicates.get(doc_name)
+        return duplicate.canonical if duplicate is not None else doc_name
+
+    def remove(self, doc_name, keep_members=False):
+        """
+        Forget a document; if it was canonical, return the duplicates that pointed at it.
+        keep_members leaves them attached, for a canonical document that is being re-indexed.
+        """
+        duplicate = self.duplicates.pop(doc_name, None)
+        if duplicate is not None:
+            remaining = tuple(name for name in self.members.get(duplicate.canonical, ()) if name != doc_name)
+            if remaining:
+                self.members[duplicate.canonical] = remaining
+            else:
+                self.members.pop(duplicate.canonical, None)
+
+        signature = self.signatures.pop(doc_name, None)
+        if signature is None:
+            return []
+        for key in self._band_keys(signature):
+            bucket = self._writable_bucket(key)
+            bucket.discard(doc_name)
+            if not bucket:
+                del self.buckets[key]
+                if self._owned is not None:
+                    self._owned.discard(key)
+        return [] if keep_members else list(self.members.pop(doc_name, ()))
+
+    # Snapshot support: signatures as arrays, duplicate entries in the manifest
+
+    def to_snapshot(self):
+        names = sorted(self.signatures)
+        minhasher = self.minhasher
+        arrays = {"dedup_signatures": np.array([self.signatures[name] for name in names], dtype=np.uint32)
+                  .reshape(len(names), minhasher.num_perm)}
+        arrays["dedup_names.blob"], arrays["dedup_names.offsets"] = pack_strings(names)
+        manifest = {"threshold": self.threshold,
+                    "minhash": [minhasher.num_perm, minhasher.shingle_size, minhasher.seed],
+                    "duplicates": {name: list(duplicate) for name, duplicate in self.duplicates.items()}}
+        return arrays, manifest
+
+    @classmethod
+    def from_snapshot(cls, manifest, arrays, threshold, minhasher):
+        """Rebuild from a snapshot; bands are recomputed, so the threshold may differ from the saved one"""
+        index = cls(threshold, minhasher)
+        if manifest.get("minhash") != [minhasher.num_perm, minhasher.shingle_size, minhasher.seed]:
+            return index  # signatures from a different hash family cannot be compared
+        names = StringTable(arrays["dedup_names.blob"], arrays["dedup_names.offsets"])
+        signatures = np.array(arrays["dedup_signatures"])
+        for row, name in enumerate(names):
+            index.add_canonical(name, signatures[row])
+        for name, fields in manifest["duplicates"].items():
+            index.add_duplicate(name, Duplicate(*fields))
+        return index
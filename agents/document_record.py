@@ -0,0 +1,145 @@
+"""
+Document Record - Compact per-document storage for the RAG knowledge base
+Replaces the nested dict-of-dicts-of-lists layout: slotted fields, interned
+type/entity names, entities as two parallel tuples, chunk offsets in one int
+array and the digest as raw bytes. Dict-style lookups ("type", "entities",
+"chunks", "digest", "generation") keep working for existing callers.
+"""
+import sys
+import tracemalloc
+from array import array
+
+
+class DocumentRecord:
+    __slots__ = ("doc_type", "_entity_names", "_entity_values", "_chunk_offsets", "_digest", "generation")
+
+    def __init__(self, doc_type, entities=None, chunks=(), digest=None, generation=None):
+        self.doc_type = sys.intern(doc_type)
+        names, values = [], []
+        for entity, entity_values in (entities or {}).items():
+            entity = sys.intern(entity)
+            for value in entity_values:
+                names.append(entity)
+                values.append(sys.intern(value))
+        self._entity_names = tuple(names)
+        self._entity_values = tuple(values)
+        self._chunk_offsets = array("q", [offset for chunk in chunks for offset in chunk])
+        self.digest = digest
+        self.generation = generation
+
+    def copy(self):
+        """Shallow copy; entity tuples and chunk offsets are never modified, so they are shared"""
+        clone = DocumentRecord.__new__(DocumentRecord)
+        for field in self.__slots__:
+            setattr(clone, field, getattr(self, field))
+        return clone
+
+    # Entities
+
+    def entity_items(self):
+        """(entity, value) pairs in extraction order, without building a dict"""
+        return zip(self._entity_names, self._entity_values)
+
+    def first(self, entity, default=None):
+        """First extracted value of an entity"""
+        for name, value in self.entity_items():
+            if name == entity:
+                return value
+        return default
+
+    @property
+    def entities(self):
+        entities = {}
+        for name, value in self.entity_items():
+            entities.setdefault(name, []).append(value)
+        return entities
+
+    # Chunks
+
+    @property
+    def chunk_count(self):
+        return len(self._chunk_offsets) // 2
+
+    def chunk_span(self, chunk_index):
+        return self._chunk_offsets[2 * chunk_index], self._chunk_offsets[2 * chunk_index + 1]
+
+    @property
+    def chunks(self):
+        offsets = self._chunk_offsets
+        return list(zip(offsets[::2], offsets[1::2]))
+
+    # Digest is kept as 32 raw bytes instead of a 64-character hex string
+
+    @property
+    def digest(self):
+        return self._digest.hex() if self._digest is not None else None
+
+    @digest.setter
+    def digest(self, value):
+        self._digest = bytes.fromhex(value) if value else None
+
+    # Dict-style access for callers written against the old layout
+
+    _FIELDS = {"type": "doc_type", "entities": "entities", "chunks": "chunks",
+               "digest": "digest", "generation": "generation"}
+
+    def __getitem__(self, key):
+        if key not in self._FIELDS:
+            raise KeyError(key)
+        return getattr(self, self._FIELDS[key])
+
+    def get(self, key, default=None):
+        return self[key] if key in self._FIELDS else default
+
+    def __setitem__(self, key, value):
+        if key not in ("digest", "generation"):
+            raise KeyError(f"{key} is read-only")
+        setattr(self, key, value)
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(record["type"], record.get("entities"), record.get("chunks", ()),
+                   record.get("digest"), record.get("generation"))
+
+    def to_dict(self):
+        return {key: self[key] for key in self._FIELDS}
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentRecord) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"DocumentRecord({self.to_dict()!r})"
+
+
+def benchmark_memory(num_documents=100_000):
+    """Compare knowledge_base memory for the old nested-dict layout and DocumentRecord"""
+    def fresh(value):
+        # Regex matches are new string objects, so don't let the benchmark share literals
+        return (value + " ")[:-1]
+
+    def sample(i):
+        return {
+            "type": fresh("contracts" if i % 2 else "reports"),
+            "entities": {"amount": [f"{i % 997},000"], "parties": [f"Company {i % 50} & Vendor {i % 7}"],
+                         "term": [fresh("12 months")], "risk": [fresh(("Low", "Medium", "High")[i % 3])]},
+            "chunks": [(0, 2000), (1800, 3800 + i)],
+            "digest": f"{i:064x}",
+            "generation": 1700000000000000 + i
+        }
+
+    results = {}
+    for layout, build in (("nested_dict", sample), ("document_record", lambda i: DocumentRecord.from_dict(sample(i)))):
+        tracemalloc.start()
+        knowledge_base = {f"contracts/contract_{i:06d}.txt": build(i) for i in range(num_documents)}
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[layout] = {"bytes": current, "bytes_per_document": round(current / num_documents, 1)}
+        del knowledge_base
+
+    results["savings_ratio"] = round(results["nested_dict"]["bytes"] / results["document_record"]["bytes"], 2)
+    return results
+
+
+if __name__ == "__main__":
+    print("📏 Knowledge base memory benchmark")
+    print(benchmark_memory())
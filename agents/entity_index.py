@@ -0,0 +1,177 @@
+"""
+Entity Index - Secondary indexes over extracted entities for filtered retrieval
+Numeric entities and the reporting period (as (year, quarter) keys) live in sorted
+arrays searched with bisect; categorical entities (risk, document type) live in inverted indexes.
+A filter like "contracts over $40,000 with Medium risk" costs O(log n + k).
+"""
+from bisect import bisect_left, bisect_right
+
+from agents.numeric_columns import ENTITY_UNITS, PARSERS, document_period, period_span
+
+# Entities matched by exact (case-insensitive) value rather than by range
+CATEGORICAL_ENTITIES = ("risk",)
+
+RANGE_OPERATORS = (">", ">=", "<", "<=", "==")
+
+
+class SortedRangeIndex:
+    """Parallel sorted value / document lists; range lookups are two bisects plus a slice"""
+
+    def __init__(self):
+        self.keys = []        # sorted values
+        self.doc_names = []   # doc_names[i] holds keys[i]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def copy(self):
+        clone = SortedRangeIndex()
+        clone.keys = list(self.keys)
+        clone.doc_names = list(self.doc_names)
+        return clone
+
+    def add(self, value, doc_name):
+        position = bisect_right(self.keys, value)
+        self.keys.insert(position, value)
+        self.doc_names.insert(position, doc_name)
+
+    def remove(self, value, doc_name):
+        position = self.doc_names.index(doc_name, bisect_left(self.keys, value), bisect_right(self.keys, value))
+        del self.keys[position]
+        del self.doc_names[position]
+
+    def range(self, low=None, high=None, include_low=True, include_high=True):
+        """Documents with low <(=) value <(=) high; None leaves that side open"""
+        keys = self.keys
+        start = 0 if low is None else (bisect_left if include_low else bisect_right)(keys, low)
+        end = len(keys) if high is None else (bisect_right if include_high else bisect_left)(keys, high)
+        return set(self.doc_names[start:end]) if start < end else set()
+
+
+class EntityIndex:
+    def __init__(self, entity_units=None, categorical=CATEGORICAL_ENTITIES):
+        self.entity_units = entity_units or ENTITY_UNITS
+        self.ranges = {entity: SortedRangeIndex() for entity in self.entity_units}
+        self.ranges["period"] = SortedRangeIndex()
+        self.values = {entity: {} for entity in categorical}   # entity -> {value: doc names}
+        self.values["doc_type"] = {}
+        self.doc_keys = {}   # doc_name -> indexed (entity, key) pairs, used on removal
+        self._owned = None   # (entity, key) document sets this copy may write; None = all of them
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base):
+        index = cls()
+        for doc_name, record in knowledge_base.items():
+            index.add(doc_name, record)
+        return index
+
+    def copy(self):
+        """Copy for a new index version; categorical document sets are copied on first write"""
+        clone = EntityIndex.__new__(EntityIndex)
+        clone.entity_units = self.entity_units
+        clone.ranges = {entity: index.copy() for entity, index in self.ranges.items()}
+        clone.values = {entity: dict(documents) for entity, documents in self.values.items()}
+        clone.doc_keys = dict(self.doc_keys)
+        clone._owned = set()
+        return clone
+
+    def _writable_documents(self, entity, key):
+        documents = self.values[entity].get(key)
+        if documents is None:
+            documents = self.values[entity][key] = set()
+        elif self._owned is None or (entity, key) in self._owned:
+            return documents
+        else:
+            documents = self.values[entity][key] = set(documents)
+        if self._owned is not None:
+            self._owned.add((entity, key))
+        return documents
+
+    def _key(self, entity, value):
+        """Index key for a raw entity value: a parsed number, a (year, quarter) period or a normalized category"""
+        if entity in self.values:
+            return str(value).strip().lower()
+        if entity == "period":
+            span = period_span(value)
+            return span[0] if span else None
+        if not isinstance(value, str):
+            return value
+        return PARSERS[self.entity_units[entity]](value)
+
+    def _span(self, entity, value):
+        """Lowest and highest index keys a filter bound stands for; a bare year covers all its quarters"""
+        if entity == "period":
+            return period_span(value)
+        key = self._key(entity, value)
+        return None if key is None else (key, key)
+
+    def add(self, doc_name, record):
+        """Index a document's entities, replacing an older version"""
+        self.remove(doc_name)
+        keys = [("doc_type", record.doc_type.lower()), ("period", self._key("period", document_period(doc_name)))]
+        for entity, value in record.entity_items():
+            if entity in self.ranges or entity in self.values:
+                keys.append((entity, self._key(entity, value)))
+        keys = [(entity, key) for entity, key in dict.fromkeys(keys) if key is not None and key != "unknown"]
+
+        for entity, key in keys:
+            if entity in self.ranges:
+                self.ranges[entity].add(key, doc_name)
+            else:
+                self._writable_documents(entity, key).add(doc_name)
+        self.doc_keys[doc_name] = keys
+
+    def remove(self, doc_name):
+        for entity, key in self.doc_keys.pop(doc_name, ()):
+            if entity in self.ranges:
+                self.ranges[entity].remove(key, doc_name)
+            else:
+                documents = self._writable_documents(entity, key)
+                documents.discard(doc_name)
+                if not documents:
+                    del self.values[entity][key]
+                    if self._owned is not None:
+                        self._owned.discard((entity, key))
+
+    def _lookup(self, entity, condition):
+        if entity in self.values:
+            options = condition if isinstance(condition, (list, tuple, set)) else [condition]
+            matched = set()
+            for option in options:
+                matched |= self.values[entity].get(self._key(entity, option), set())
+            return matched
+
+        if entity not in self.ranges:
+            raise ValueError(f"Unsupported filter entity: {entity}")
+        if not isinstance(condition, dict):
+            condition = {"==": condition}
+        bounds = {"low": None, "high": None, "include_low": True, "include_high": True}
+        for operator, value in condition.items():
+            if operator not in RANGE_OPERATORS:
+                raise ValueError(f"Unsupported operator for {entity}: {operator}")
+            span = self._span(entity, value)
+            if span is None:
+                raise ValueError(f"Cannot parse {entity} bound: {value}")
+            first, last = span
+            if operator in (">", ">=", "=="):
+                bounds["low"], bounds["include_low"] = (last, False) if operator == ">" else (first, True)
+            if operator in ("<", "<=", "=="):
+                bounds["high"], bounds["include_high"] = (first, False) if operator == "<" else (last, True)
+        return self.ranges[entity].range(**bounds)
+
+    def match(self, filters):
+        """
+        Documents satisfying every filter, e.g.
+        {"doc_type": "contracts", "amount": {">": 40000}, "risk": "Medium", "period": {">=": "2024"}}.
+        Range bounds may be numbers or raw strings ("$40,000", "2 years"); a period bound
+        is a year (2024, "2024") covering all of its quarters, or a quarter ("2024-Q4").
+        """
+        matches = sorted((self._lookup(entity, condition) for entity, condition in filters.items()), key=len)
+        if not matches:
+            return set()
+        result = set(matches[0])
+        for documents in matches[1:]:
+            result &= documents
+            if not result:
+                break
+        return result
@@ -0,0 +1,202 @@
+"""
+Extraction Engine - Registry of entity extraction rules for the RAG agent
+Each document type's rules are compiled once into a single alternation of lookaheads
+with named groups, so a document is scanned in one pass instead of once per entity
+"""
+import re
+import time
+
+# Inline flag letters usable in a scoped group such as (?i:...)
+SCOPED_FLAGS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"), (re.VERBOSE, "x"))
+
+DEFAULT_TYPE_KEYWORDS = {
+    "contracts": ["contract"],
+    "reports": ["report"]
+}
+
+DEFAULT_RULES = {
+    "contracts": {
+        "amount": r"\$([0-9,]+)",
+        "parties": r"Parties:\s*(.+)",
+        "term": r"Term:\s*([0-9]+\s*(months|years))",
+        "risk": r"Risk Level:\s*(\w+)"
+    },
+    "reports": {
+        "revenue": r"Revenue:\s*\$?([0-9,.]+[MK]?)",
+        "profit": r"Profit:\s*\$?([0-9,.]+[MK]?)",
+        "growth": r"growth.*?([0-9]+)%"
+    }
+}
+
+
+class ExtractionRule:
+    def __init__(self, entity, pattern, flags=re.IGNORECASE):
+        self.entity = entity
+        self.pattern = pattern
+        self.flags = flags
+        self.regex = re.compile(pattern, flags)  # standalone copy, used for profiling
+        self.matches = 0
+        self.seconds = 0.0
+
+    def scoped_pattern(self):
+        """Pattern wrapped so its flags apply only inside the combined regex"""
+        letters = "".join(letter for flag, letter in SCOPED_FLAGS if self.flags & flag)
+        return f"(?{letters}:{self.pattern})" if letters else f"(?:{self.pattern})"
+
+
+class ExtractionEngine:
+    """
+    Rules are wrapped in lookaheads, so matching one rule never hides another:
+    results equal a separate findall per rule. Rule patterns must not use named
+    groups or numbered backreferences, since they are renumbered inside the
+    combined regex.
+    """
+
+    def __init__(self, rules=None, type_keywords=None, profile_every=0):
+        self.rules = {}           # doc_type -> [ExtractionRule]
+        self.type_keywords = {}   # doc_type -> name keywords used by classify()
+        self._compiled = {}       # doc_type -> (combined regex, {outer group: (rule, value group)})
+        self.scan_stats = {}      # doc_type -> {"scans", "chars", "seconds", "profiled"}
+        self.profile_every = profile_every   # also time each rule alone on every Nth scan of a type; 0 = off
+
+        for doc_type, keywords in (type_keywords or DEFAULT_TYPE_KEYWORDS).items():
+            self.register_type(doc_type, keywords)
+        for doc_type, entities in (rules or DEFAULT_RULES).items():
+            for entity, pattern in entities.items():
+                self.register(doc_type, entity, pattern)
+
+    def register_type(self, doc_type, keywords):
+        """Classify documents whose name contains any keyword as doc_type"""
+        self.type_keywords[doc_type] = [keyword.lower() for keyword in keywords]
+
+    def register(self, doc_type, entity, pattern, flags=re.IGNORECASE):
+        """Add an extraction rule; the type's combined regex is rebuilt on next use"""
+        self.rules.setdefault(doc_type, []).append(ExtractionRule(entity, pattern, flags))
+        self._compiled.pop(doc_type, None)
+
+    def classify(self, doc_name):
+        """Pick a document type from its name, falling back to general"""
+        name = doc_name.lower()
+        for doc_type, keywords in self.type_keywords.items():
+            if any(keyword in name for keyword in keywords):
+                return doc_type
+        return "general"
+
+    def _compile(self, doc_type):
+        compiled = self._compiled.get(doc_type)
+        if compiled is not None:
+            return compiled
+
+        parts = []
+        groups = {}
+        group_index = 1
+        for position, rule in enumerate(self.rules[doc_type]):
+            # Zero-width, so the scan stops at every position where some rule matches
+            parts.append(f"(?=(?P<r{position}>{rule.scoped_pattern()}))")
+            inner_groups = rule.regex.groups
+            # Like re.findall, keep the first capture group if the rule has one
+            groups[group_index] = (position, group_index + 1 if inner_groups else group_index)
+            group_index += 1 + inner_groups
+
+        compiled = self._compiled[doc_type] = (re.compile("|".join(parts)), groups)
+        return compiled
+
+    def extract(self, doc_type, content, owned_length=None):
+        """
+        Scan content once and return {entity: [values]} for every rule of the type.
+        With owned_length, matches starting at or after that offset are left to the
+        next overlapping chunk so they are not counted twice.
+        """
+        if doc_type not in self.rules:
+            return {}
+
+        combined, groups = self._compile(doc_type)
+        rules = self.rules[doc_type]
+        started = time.perf_counter()
+        entities = {}
+        next_start = [0] * len(rules)   # like findall, a rule's matches never overlap each other
+        for match in combined.finditer(content):
+            start = match.start()
+            if owned_length is not None and start >= owned_length:
+                break
+            # The outer named group closes last, so lastindex is the first rule matching here;
+            # later rules may match at the same position too
+            first, value_group = groups[match.lastindex]
+            for position in range(first, len(rules)):
+                if start < next_start[position]:
+                    continue
+                rule = rules[position]
+                if position == first:
+                    end, value = match.end(match.lastindex), match.group(value_group)
+                else:
+                    found = rule.regex.match(content, start)
+                    if found is None:
+                        continue
+                    end, value = found.end(), found.group(1 if rule.regex.groups else 0)
+                next_start[position] = max(end, start + 1)
+                rule.matches += 1
+                entities.setdefault(rule.entity, []).append(value)
+
+        stats = self._scan_stats(doc_type)
+        stats["scans"] += 1
+        stats["chars"] += len(content)
+        stats["seconds"] += time.perf_counter() - started
+        if self.profile_every and stats["scans"] % self.profile_every == 0:
+            self.profile(doc_type, content if owned_length is None else content[:owned_length])
+        return entities
+
+    def _scan_stats(self, doc_type):
+        return self.scan_stats.setdefault(doc_type, {"scans": 0, "chars": 0, "seconds": 0.0, "profiled": 0})
+
+    def profile(self, doc_type, content):
+        """Time each rule on its own against content - diagnostics for slow rules"""
+        for rule in self.rules.get(doc_type, []):
+            started = time.perf_counter()
+            rule.regex.findall(content)
+            rule.seconds += time.perf_counter() - started
+        self._scan_stats(doc_type)["profiled"] += 1
+
+    def get_stats(self):
+        """
+        Per-type scan timings plus per-rule match counters and profiled timings; "profiled"
+        counts the scans whose rules were timed (see profile_every)
+        """
+        return {
+            doc_type: {
+                **self.scan_stats.get(doc_type, {"scans": 0, "chars": 0, "seconds": 0.0, "profiled": 0}),
+                "rules": {
+                    rule.entity: {"matches": rule.matches, "profiled_seconds": rule.seconds}
+                    for rule in rules
+                }
+            }
+            for doc_type, rules in self.rules.items()
+        }
+
+    def drain_stats(self):
+        """Return and reset the raw counters - ships worker-process stats back to the parent"""
+        drained = {
+            doc_type: {
+                **self.scan_stats.get(doc_type, {"scans": 0, "chars": 0, "seconds": 0.0, "profiled": 0}),
+                "matches": [rule.matches for rule in rules],
+                "rule_seconds": [rule.seconds for rule in rules]
+            }
+            for doc_type, rules in self.rules.items()
+        }
+        self.scan_stats = {}
+        for rules in self.rules.values():
+            for rule in rules:
+                rule.matches = 0
+                rule.seconds = 0.0
+        return drained
+
+    def merge_stats(self, drained):
+        """Add counters returned by drain_stats() in another process"""
+        for doc_type, stats in drained.items():
+            if doc_type not in self.rules:
+                continue
+            totals = self._scan_stats(doc_type)
+            for key in ("scans", "chars", "seconds", "profiled"):
+                totals[key] += stats[key]
+            for rule, matches, seconds in zip(self.rules[doc_type], stats["matches"], stats["rule_seconds"]):
+                rule.matches += matches
+                rule.seconds += seconds
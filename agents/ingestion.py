@@ -0,0 +1,107 @@
+"""
+Ingestion - Turns documents into partial index entries for the RAG agent
+analyze_batch() is pure (chunk, extract, tokenize, embed), so it can run in a
+process pool; the agent merges the results into its indexes in input order
+"""
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from agents.chunking import iter_chunks
+from agents.passages import DocumentPassages
+from agents.text_index import tokenize
+
+# Chunks are embedded in batches of this size while a document streams through
+EMBED_BATCH_SIZE = 64
+
+
+def analyze_document(doc_name, content, extractor, embedder, chunk_size, chunk_overlap, vocabulary, minhasher=None):
+    """
+    Chunk, extract, tokenize and embed one document. Terms are stored as ids into
+    the batch vocabulary so partial indexes stay compact when sent between processes.
+    A few term-rich sentences per chunk are kept, with term spans, for extractive
+    answers. With a minhasher, the document's MinHash signature is built from the
+    same chunks.
+    """
+    doc_type = extractor.classify(doc_name)
+    entities = {}
+    chunks = []
+    chunk_terms = []
+    vector_blocks = []
+    pending_texts = []
+    name_tokens = tokenize(doc_name)
+    passages = DocumentPassages()
+    signature = minhasher.empty() if minhasher is not None else None
+
+    for chunk in iter_chunks(content, chunk_size, chunk_overlap):
+        # Matches starting in the overlap belong to the next chunk
+        owned_length = None if chunk.final else chunk_size - chunk_overlap
+        for entity, values in extractor.extract(doc_type, chunk.text, owned_length).items():
+            entities.setdefault(entity, []).extend(values)
+
+        tokens = name_tokens + tokenize(chunk.text)
+        counts = Counter(tokens)
+        term_ids = np.fromiter((vocabulary.setdefault(term, len(vocabulary)) for term in counts),
+                               dtype=np.int32, count=len(counts))
+        chunk_terms.append((term_ids, np.fromiter(counts.values(), dtype=np.int32, count=len(counts)), len(tokens)))
+        chunks.append((chunk.start, chunk.end))
+        passages.add_text(chunk.text, chunk.start, owned_length)
+        if signature is not None:
+            minhasher.update(signature, chunk.text)
+
+        pending_texts.append(chunk.text)
+        if len(pending_texts) >= EMBED_BATCH_SIZE:
+            vector_blocks.append(embedder.embed(pending_texts))
+            pending_texts = []
+
+    if pending_texts:
+        vector_blocks.append(embedder.embed(pending_texts))
+
+    return {
+        "name": doc_name,
+        "type": doc_type,
+        "entities": entities,
+        "chunks": chunks,
+        "chunk_terms": chunk_terms,
+        "vectors": np.concatenate(vector_blocks) if vector_blocks else np.zeros((0, embedder.dim), dtype=np.float32),
+        "passages": passages.freeze(),
+        "signature": signature
+    }
+
+
+def analyze_batch(documents, extractor, embedder, chunk_size, chunk_overlap, minhasher=None):
+    """Analyze (doc_name, content) pairs into one partial index with a shared vocabulary"""
+    vocabulary = {}
+    analyses = [analyze_document(doc_name, content, extractor, embedder, chunk_size, chunk_overlap, vocabulary,
+                                 minhasher)
+                for doc_name, content in documents]
+    return {"terms": list(vocabulary), "documents": analyses}
+
+
+# Per-process state, set once by the pool initializer instead of pickled per batch
+_worker = {}
+
+
+def _init_worker(extractor, embedder, chunk_size, chunk_overlap, minhasher):
+    extractor.drain_stats()  # start from zero so only this worker's work is reported back
+    _worker.update(extractor=extractor, embedder=embedder, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                   minhasher=minhasher)
+
+
+def _analyze_batch_in_worker(documents):
+    extractor = _worker["extractor"]
+    partial = analyze_batch(documents, extractor, _worker["embedder"], _worker["chunk_size"], _worker["chunk_overlap"],
+                            _worker["minhasher"])
+    partial["extraction_stats"] = extractor.drain_stats()
+    return partial
+
+
+def analyze_in_pool(documents, extractor, embedder, chunk_size, chunk_overlap, workers, batch_size=32, minhasher=None):
+    """Fan (doc_name, content) pairs out to a process pool in batches; partial indexes come back in input order"""
+    batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(extractor, embedder, chunk_size, chunk_overlap, minhasher)) as pool:
+        for partial in pool.map(_analyze_batch_in_worker, batches):
+            extractor.merge_stats(partial.pop("extraction_stats"))
+            yield partial
@@ -0,0 +1,190 @@
+"""
+Intent Classifier - Multinomial naive Bayes over hashed word features for routing
+Predicts the set of backends a request needs, e.g. GCS alone for "upload the Q4
+report pdf", where the keyword tables would also hit BigQuery. Training is
+offline from labeled examples; scoring one request is a single gather-and-sum
+over a (features, labels) log-probability matrix. Unsure predictions return None
+so the router falls back to its keyword rules.
+"""
+import json
+import random
+import time
+import zlib
+
+import numpy as np
+
+from agents.router_agent import RouterAgent
+from agents.text_index import TOKEN_PATTERN
+
+LABEL_SEPARATOR = "+"   # a label is the sorted service set, e.g. "bigquery+gcs"; "" means no backend
+
+
+def service_label(services):
+    return LABEL_SEPARATOR.join(sorted(services))
+
+
+def label_services(label):
+    return label.split(LABEL_SEPARATOR) if label else []
+
+
+def examples_from_history(workflow_history):
+    """
+    (text, services) pairs from EnterpriseAutomationHub.workflow_history entries that carry a
+    confirmed "services" label. Unlabeled entries are skipped: their routed services are the
+    router's own guess, and training on them would teach it its misroutes.
+    """
+    return [(entry["input"], list(entry["services"])) for entry in workflow_history
+            if entry.get("services") is not None]
+
+
+def load_examples(path):
+    """(text, services) pairs from a JSON Lines file of {"text": ..., "services": [...]}"""
+    with open(path) as handle:
+        rows = [json.loads(line) for line in handle if line.strip()]
+    return [(row["text"], row["services"]) for row in rows]
+
+
+class IntentClassifier:
+    def __init__(self, num_features=1 << 16, alpha=0.1, min_confidence=0.8):
+        self.num_features = num_features
+        self.alpha = alpha                     # additive smoothing
+        self.min_confidence = min_confidence   # below this posterior, predict() defers to the rules
+        self.labels = []
+        self._log_priors = None       # (labels,) float32
+        self._log_likelihoods = None  # (num_features, labels) float32, one row per hashed feature
+        self._known = None            # features seen in training; the rest carry no evidence
+
+    @property
+    def trained(self):
+        return self._log_priors is not None
+
+    def features(self, text):
+        """Hashed feature ids of the text's words and word bigrams"""
+        words = TOKEN_PATTERN.findall(text.lower())
+        grams = words + [first + " " + second for first, second in zip(words, words[1:])]
+        hashes = np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint32, count=len(grams))
+        return hashes % np.uint32(self.num_features)
+
+    def train(self, examples):
+        """Fit on (text, services) pairs; returns self"""
+        examples = list(examples)
+        labels = sorted({service_label(services) for _, services in examples})
+        if not labels:
+            raise ValueError("No training examples")
+        columns = {label: column for column, label in enumerate(labels)}
+
+        counts = np.zeros((self.num_features, len(labels)), dtype=np.float64)
+        label_counts = np.zeros(len(labels), dtype=np.float64)
+        for text, services in examples:
+            column = columns[service_label(services)]
+            label_counts[column] += 1
+            np.add.at(counts[:, column], self.features(text), 1)
+
+        smoothed = counts + self.alpha
+        self._log_likelihoods = (np.log(smoothed) - np.log(smoothed.sum(axis=0))).astype(np.float32)
+        self._log_priors = np.log(label_counts / label_counts.sum()).astype(np.float32)
+        self._known = counts.any(axis=1)
+        self.labels = labels
+        return self
+
+    def posteriors(self, text):
+        """Probability per label (in self.labels order), or None when no feature was seen in training"""
+        features = self.features(text)
+        features = features[self._known[features]]
+        if not len(features):
+            return None
+        scores = self._log_priors + self._log_likelihoods[features].sum(axis=0)
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict(self, text):
+        """Predicted services, or None when untrained or unsure - the caller then uses its rules"""
+        if not self.trained:
+            return None
+        posteriors = self.posteriors(text)
+        if posteriors is None:
+            return None
+        best = int(posteriors.argmax())
+        if posteriors[best] < self.min_confidence:
+            return None
+        return label_services(self.labels[best])
+
+    def save(self, path):
+        """Write the trained model to an .npz file"""
+        with open(path, "wb") as handle:
+            np.savez(handle, labels=np.array(self.labels, dtype=str), log_priors=self._log_priors,
+                     log_likelihoods=self._log_likelihoods, known=self._known,
+                     params=np.array([self.num_features, self.alpha, self.min_confidence], dtype=np.float64))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            num_features, alpha, min_confidence = data["params"]
+            classifier = cls(int(num_features), float(alpha), float(min_confidence))
+            classifier.labels = [str(label) for label in data["labels"]]
+            classifier._log_priors = data["log_priors"]
+            classifier._log_likelihoods = data["log_likelihoods"]
+            classifier._known = data["known"]
+        return classifier
+
+
+def generate_labeled_requests(num_requests=2000, seed=11):
+    """Synthetic (text, services) requests whose wording trips the keyword tables"""
+    rng = random.Random(seed)
+    clients = ["acme", "globex", "initech", "umbrella", "stark", "wayne", "hooli", "vandelay"]
+    quarters = ["Q1 2024", "Q2 2024", "Q3 2024", "Q4 2024", "Q4 2023"]
+    templates = [
+        ("Upload the {quarter} report pdf to storage", ["gcs"]),
+        ("Download the {client} report file", ["gcs"]),
+        ("Retrieve the signed contract document for {client}", ["gcs"]),
+        ("List files in the {client} folder", ["gcs"]),
+        ("Analyze {quarter} claims for {client}", ["bigquery"]),
+        ("Run a fraud analytics query on {client} claims", ["bigquery"]),
+        ("Show me the datasets and tables for {client}", ["bigquery"]),
+        ("Build the {quarter} claims report", ["bigquery"]),
+        ("Which {client} claims look like fraud in {quarter}", ["bigquery"]),
+        ("Send an email to {client} about the {quarter} report", ["workflow"]),
+        ("Notify {client} that the contract renewal is due", ["workflow"]),
+        ("Automate the {client} approval pipeline", ["workflow"]),
+        ("Create sample data for the {client} demonstration", ["bigquery", "gcs"]),
+        ("Set up a demo environment for {client}", ["bigquery", "gcs"]),
+    ]
+    requests = []
+    for _ in range(num_requests):
+        template, services = rng.choice(templates)
+        requests.append((template.format(client=rng.choice(clients), quarter=rng.choice(quarters)), services))
+    return requests
+
+
+def benchmark_intent_classifier(num_requests=2000, seed=11):
+    """Wrong backend calls of keyword rules versus the classifier on held-out requests, plus scoring latency"""
+    requests = generate_labeled_requests(num_requests, seed)
+    split = len(requests) // 2
+    classifier = IntentClassifier().train(requests[:split])
+    test = requests[split:]
+
+    keyword_router = RouterAgent()
+    model_router = RouterAgent(classifier)
+    wrong = {"keywords": 0, "classifier": 0}
+    for text, services in test:
+        for name, router in (("keywords", keyword_router), ("classifier", model_router)):
+            routed = set(router.analyze_intent(text)["required_services"])
+            wrong[name] += len(routed ^ set(services))   # extra calls plus missed backends
+
+    start = time.perf_counter()
+    for text, _ in test:
+        classifier.predict(text)
+    micros = (time.perf_counter() - start) / len(test) * 1e6
+
+    return {
+        "test_requests": len(test),
+        "wrong_backend_calls_keywords": wrong["keywords"],
+        "wrong_backend_calls_classifier": wrong["classifier"],
+        "predict_us": round(micros, 1)
+    }
+
+
+# Example usage
+if __name__ == "__main__":
+    print("🏁 Intent classifier benchmark")
+    print(benchmark_intent_classifier())
@@ -0,0 +1,63 @@
+"""
+Keyword Matcher - Aho-Corasick automaton over a fixed keyword set
+Finds every occurrence of every keyword (including overlapping and nested ones,
+e.g. "data" inside "dataset") in a single left-to-right pass, so matching cost
+depends on the input length, not on how many keywords are registered
+"""
+from collections import deque
+
+
+class KeywordMatcher:
+    def __init__(self, keywords=()):
+        self.keywords = []
+        self._goto = [{}]      # node -> {char: next node}
+        self._fail = [0]       # node -> longest proper suffix node
+        self._output = [()]    # node -> keywords ending at this node (fail chain included)
+        for keyword in keywords:
+            self._insert(keyword)
+        self._link()
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def _insert(self, keyword):
+        if not keyword or keyword in self.keywords:
+            return
+        self.keywords.append(keyword)
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            node = next_node
+        self._output[node] += (keyword,)
+
+    def _link(self):
+        """Breadth-first failure links; each node inherits the outputs of its failure node"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] += self._output[self._fail[child]]
+
+    def find_all(self, text):
+        """Set of keywords occurring anywhere in text"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
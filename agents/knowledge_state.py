@@ -0,0 +1,78 @@
+"""
+Knowledge State - One published generation of the RAG agent's knowledge and indexes
+Ingestion copies the current state, applies its changes to the copy and publishes
+it with a single reference assignment. Readers take the current state once per
+query, so they never block on ingestion and never see a half-applied batch.
+"""
+from agents.entity_index import EntityIndex
+from agents.knowledge_stats import KnowledgeStats
+from agents.numeric_columns import NumericColumns
+from agents.passages import PassageStore
+from agents.snapshot import FrozenKnowledgeBase, thaw
+
+
+class KnowledgeState:
+    def __init__(self, knowledge_base, index, vectors, version=0, stats=None, numeric=None, entities=None,
+                 duplicates=None, passages=None):
+        self.knowledge_base = knowledge_base
+        self.index = index
+        self.vectors = vectors
+        self.version = version
+        self.duplicates = duplicates   # NearDuplicateIndex, or None when dedup is off
+        self.passages = passages if passages is not None else PassageStore()
+        # Derived aggregates; None means rebuild from knowledge_base on first use (e.g. after a snapshot load)
+        self._stats = stats
+        self._numeric = numeric
+        self._entities = entities
+
+    @property
+    def frozen(self):
+        return isinstance(self.knowledge_base, FrozenKnowledgeBase)
+
+    def copy(self):
+        """
+        Writable copy for the next generation. A loaded snapshot is thawed; otherwise
+        large structures share storage with this state and copy on write.
+        """
+        # Build any lazy aggregate from this state first: rebuilt later, it would already count
+        # the copy's pending changes that ingestion then applies to it again
+        stats, numeric, entities = self.stats(), self.numeric_columns(), self.entity_index()
+        if self.frozen:
+            knowledge_base, index, vectors = thaw(self.knowledge_base, self.index, self.vectors)
+        else:
+            knowledge_base, index, vectors = dict(self.knowledge_base), self.index.copy(), self.vectors.copy()
+        return KnowledgeState(
+            knowledge_base, index, vectors, self.version,
+            stats.copy(), numeric.copy(), entities.copy(),
+            self.duplicates.copy() if self.duplicates is not None else None,
+            self.passages.copy()
+        )
+
+    # Lazily built aggregates; a concurrent double build is harmless since both read the same state
+
+    def stats(self):
+        if self._stats is None:
+            self._stats = KnowledgeStats.from_knowledge_base(self.knowledge_base)
+        return self._stats
+
+    def numeric_columns(self):
+        if self._numeric is None:
+            self._numeric = NumericColumns.from_knowledge_base(self.knowledge_base)
+        return self._numeric
+
+    def entity_index(self):
+        if self._entities is None:
+            self._entities = EntityIndex.from_knowledge_base(self.knowledge_base)
+        return self._entities
+
+    def check_aggregates(self):
+        """Names of incrementally maintained aggregates that disagree with a rebuild from knowledge_base"""
+        rebuilt = KnowledgeStats.from_knowledge_base(self.knowledge_base)
+        stats = self.stats()
+        mismatched = [name for name in ("total_documents", "type_counts", "entity_documents", "entity_values",
+                                        "value_documents") if getattr(stats, name) != getattr(rebuilt, name)]
+        if set(self.numeric_columns().doc_rows) != set(self.knowledge_base):
+            mismatched.append("numeric_columns")
+        if set(self.entity_index().doc_keys) != set(self.knowledge_base):
+            mismatched.append("entity_index")
+        return mismatched
@@ -0,0 +1,180 @@
+"""
+Knowledge Stats - Aggregates over the RAG knowledge base, maintained as documents
+are added and removed so status checks never walk the corpus. The top of the
+(entity, value) ranking is kept sorted as counts change, so a status page costs
+O(page) rather than a sort of every extracted value.
+"""
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter
+
+# Leading (entity, value) pairs ranked incrementally; pages past this sort on demand
+TOP_ENTITIES_CAPACITY = 1000
+
+# Value counts are split into shards so copying the stats for a new generation shares unwritten shards
+VALUE_SHARDS = 256
+
+
+def _bump(counter, key, delta):
+    """Adjust a count, dropping the key at zero so counters only hold what is still indexed"""
+    count = counter[key] + delta
+    if count:
+        counter[key] = count
+    else:
+        del counter[key]
+
+
+class ShardedCounts:
+    """(entity, value) -> documents; a copy shares every shard until it first writes to it"""
+
+    def __init__(self, num_shards=VALUE_SHARDS):
+        self.num_shards = num_shards
+        self._shards = {}    # shard number -> {pair: count}
+        self._owned = None   # shards this copy may write; None = all of them
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __eq__(self, other):
+        return isinstance(other, ShardedCounts) and dict(self.items()) == dict(other.items())
+
+    def copy(self):
+        clone = ShardedCounts(self.num_shards)
+        clone._shards = dict(self._shards)
+        clone._owned = set()
+        clone._size = self._size
+        return clone
+
+    def get(self, pair, default=0):
+        return self._shards.get(hash(pair) % self.num_shards, {}).get(pair, default)
+
+    def items(self):
+        for shard in self._shards.values():
+            yield from shard.items()
+
+    def bump(self, pair, delta):
+        """Adjust a pair's count, dropping it at zero; returns the new count"""
+        number = hash(pair) % self.num_shards
+        shard = self._shards.get(number)
+        if shard is None:
+            shard = self._shards[number] = {}
+        elif self._owned is not None and number not in self._owned:
+            shard = self._shards[number] = dict(shard)
+        if self._owned is not None:
+            self._owned.add(number)
+
+        count = shard.get(pair, 0) + delta
+        if count:
+            self._size += pair not in shard
+            shard[pair] = count
+        else:
+            self._size -= 1
+            del shard[pair]
+        return count
+
+
+class KnowledgeStats:
+    def __init__(self):
+        self.total_documents = 0
+        self.type_counts = Counter()          # doc_type -> documents
+        self.entity_documents = Counter()     # entity -> documents mentioning it
+        self.entity_values = Counter()        # entity -> extracted values
+        self.value_documents = ShardedCounts()   # (entity, value) -> documents containing it
+        self.version = 0
+        self._top = []                        # exact head of the ranking: sorted (-documents, entity, value)
+        self._top_all = True                  # _top holds every pair
+        self._ranking = None                  # (version, full ranking) for pages past _top
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base):
+        """One-off rebuild, e.g. after mapping a snapshot"""
+        stats = cls()
+        for record in knowledge_base.values():
+            stats.add(record)
+        return stats
+
+    def copy(self):
+        """Copy for a new generation; costs O(doc types + entities + shards + TOP_ENTITIES_CAPACITY)"""
+        clone = KnowledgeStats()
+        clone.total_documents = self.total_documents
+        clone.type_counts = self.type_counts.copy()
+        clone.entity_documents = self.entity_documents.copy()
+        clone.entity_values = self.entity_values.copy()
+        clone.value_documents = self.value_documents.copy()
+        clone.version = self.version
+        clone._top = list(self._top)
+        clone._top_all = self._top_all
+        clone._ranking = self._ranking
+        return clone
+
+    def _apply(self, record, sign):
+        self.total_documents += sign
+        _bump(self.type_counts, record.doc_type, sign)
+        pairs = list(record.entity_items())
+        for entity, _ in pairs:
+            _bump(self.entity_values, entity, sign)
+        for entity in {entity for entity, _ in pairs}:
+            _bump(self.entity_documents, entity, sign)
+        for pair in set(pairs):
+            count = self.value_documents.bump(pair, sign)
+            self._rerank(pair, count - sign, count)
+        self.version += 1
+
+    def _rerank(self, pair, old, new):
+        """Keep _top an exact prefix of the ranking after one pair's count changed from old to new"""
+        top = self._top
+        boundary = top[-1] if top else None   # every pair outside _top ranks after this
+        if old:
+            old_key = (-old, *pair)
+            position = bisect_left(top, old_key)
+            if position < len(top) and top[position] == old_key:
+                del top[position]
+        if not new:
+            return
+        new_key = (-new, *pair)
+        # A pair that fell past the boundary is dropped: pairs outside _top might now rank before it
+        if self._top_all or (boundary is not None and new_key < boundary):
+            insort(top, new_key)
+            if len(top) > TOP_ENTITIES_CAPACITY:
+                top.pop()
+                self._top_all = False
+
+    def add(self, record):
+        self._apply(record, 1)
+
+    def remove(self, record):
+        self._apply(record, -1)
+
+    def top_entities(self, limit=20, offset=0):
+        """
+        (entity, value, documents) ranked by document count. Pages within TOP_ENTITIES_CAPACITY
+        come from the incrementally ranked head; deeper pages sort once per stats version.
+        """
+        end = offset + limit
+        ranked = self._top
+        if end > len(ranked) and not self._top_all:
+            if end <= TOP_ENTITIES_CAPACITY:
+                # Removals shrank the head below this page; re-select it (rare, O(values log capacity))
+                ranked = heapq.nsmallest(TOP_ENTITIES_CAPACITY, self._keys())
+                self._top, self._top_all = ranked, len(ranked) == len(self.value_documents)
+            else:
+                if self._ranking is None or self._ranking[0] != self.version:
+                    self._ranking = (self.version, sorted(self._keys()))
+                ranked = self._ranking[1]
+        return [(entity, value, -negative) for negative, entity, value in ranked[offset:end]]
+
+    def _keys(self):
+        return ((-count, entity, value) for (entity, value), count in self.value_documents.items())
+
+    def summary(self, limit=20, offset=0):
+        return {
+            "total_documents": self.total_documents,
+            "document_types": dict(self.type_counts),
+            "key_entities": [f"{entity}: {value}" for entity, value, _ in self.top_entities(limit, offset)],
+            "key_entities_total": len(self.value_documents),
+            "entity_stats": {
+                entity: {"documents": documents, "values": self.entity_values[entity]}
+                for entity, documents in self.entity_documents.items()
+            }
+        }
@@ -0,0 +1,279 @@
+"""
+Numeric Columns - Typed numeric views of extracted entities for cross-document analytics
+Money, percentages and terms are parsed once at ingestion into NumPy columns keyed by
+document row, so rollups (sum/avg/percentiles by doc type or period) run vectorized
+"""
+import re
+
+import numpy as np
+
+MONEY_PATTERN = re.compile(r"\$?\s*([0-9][0-9,]*(?:\.[0-9]+)?)\s*([KMB])?\b", re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r"([0-9]+(?:\.[0-9]+)?)")
+TERM_PATTERN = re.compile(r"([0-9]+)\s*(month|year)s?", re.IGNORECASE)
+QUARTER_PATTERN = re.compile(r"q([1-4])[\s_-]*((?:19|20)[0-9]{2})", re.IGNORECASE)
+PERIOD_PATTERN = re.compile(r"((?:19|20)[0-9]{2})[\s_-]*q([1-4])", re.IGNORECASE)   # '2024-Q4', as document_period writes it
+YEAR_PATTERN = re.compile(r"(?<![0-9])((?:19|20)[0-9]{2})(?![0-9])")
+
+MONEY_MULTIPLIERS = {"k": 1e3, "m": 1e6, "b": 1e9}
+
+# Entity -> unit of its numeric column; entities not listed stay text-only
+ENTITY_UNITS = {
+    "amount": "usd",
+    "revenue": "usd",
+    "profit": "usd",
+    "growth": "percent",
+    "term": "months"
+}
+
+
+def parse_money(text):
+    """'$1.2M' -> 1200000.0, '50,000' -> 50000.0"""
+    match = MONEY_PATTERN.search(text)
+    if not match:
+        return None
+    value = float(match.group(1).replace(",", ""))
+    return value * MONEY_MULTIPLIERS.get((match.group(2) or "").lower(), 1.0)
+
+
+def parse_percent(text):
+    """'15' or '15%' -> 15.0"""
+    match = NUMBER_PATTERN.search(text)
+    return float(match.group(1)) if match else None
+
+
+def parse_months(text):
+    """'12 months' -> 12.0, '2 years' -> 24.0"""
+    match = TERM_PATTERN.search(text)
+    if not match:
+        return None
+    return float(match.group(1)) * (12 if match.group(2).lower() == "year" else 1)
+
+
+PARSERS = {"usd": parse_money, "percent": parse_percent, "months": parse_months}
+
+
+def document_period(doc_name):
+    """Reporting period from a document name: 'q4_2024_report.txt' -> '2024-Q4', else the year"""
+    match = QUARTER_PATTERN.search(doc_name)
+    if match:
+        return f"{match.group(2)}-Q{match.group(1)}"
+    match = YEAR_PATTERN.search(doc_name)
+    return match.group(1) if match else "unknown"
+
+
+def period_span(period):
+    """
+    First and last comparable (year, quarter) keys a period covers: '2024-Q4' -> ((2024, 4), (2024, 4)),
+    '2024' or 2024 -> ((2024, 0), (2024, 4)). Quarter 0 stands for a document dated by year only.
+    """
+    text = str(period)
+    match = PERIOD_PATTERN.search(text)
+    if match:
+        key = (int(match.group(1)), int(match.group(2)))
+        return key, key
+    match = QUARTER_PATTERN.search(text)
+    if match:
+        key = (int(match.group(2)), int(match.group(1)))
+        return key, key
+    match = YEAR_PATTERN.search(text)
+    if not match:
+        return None
+    year = int(match.group(1))
+    return (year, 0), (year, 4)
+
+
+
+def grouped_stats(codes, values, percentiles=(50, 90)):
+    """{group code: count/sum/avg/min/max/percentiles} of values grouped by integer codes"""
+    # Sort by (group, value) once; each group is then a contiguous, sorted slice
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+    groups, starts, counts = np.unique(codes, return_index=True, return_counts=True)
+    sums = np.add.reduceat(values, starts) if len(values) else np.zeros(0)
+
+    result = {}
+    for group, start, count, total in zip(groups, starts, counts, sums):
+        group_values = values[start:start + count]
+        stats = {
+            "count": int(count),
+            "sum": float(total),
+            "avg": float(total / count),
+            "min": float(group_values[0]),
+            "max": float(group_values[-1])
+        }
+        for percentile, value in zip(percentiles, np.percentile(group_values, percentiles)):
+            stats[f"p{percentile}"] = float(value)
+        result[int(group)] = stats
+    return result
+
+
+def rollup_columns(columns, value, group_by=None, percentiles=(50, 90)):
+    """
+    Grouped stats over query result columns ({name: array}, e.g. from
+    BigQueryMCPServer.run_query_columns); null/NaN values are skipped.
+    """
+    for name in (value, group_by):
+        if name is not None and name not in columns:
+            raise ValueError(f"No column '{name}' in the result")
+    column = np.asarray(columns[value])
+    if column.dtype.kind in "mMSU":   # dates, timestamps and strings would coerce to meaningless numbers
+        raise ValueError(f"Column '{value}' is not numeric ({column.dtype})")
+    try:
+        values = column.astype(np.float64)
+    except (TypeError, ValueError):   # e.g. an object column of dates or Decimals mixed with text
+        raise ValueError(f"Column '{value}' is not numeric") from None
+    if group_by is None:
+        names, codes = np.array(["all"]), np.zeros(len(values), dtype=np.intp)
+    else:
+        names, codes = np.unique(np.asarray(columns[group_by]).astype(str), return_inverse=True)
+
+    keep = ~np.isnan(values)
+    groups = grouped_stats(codes.ravel()[keep], values[keep], percentiles)
+    return {str(names[group]): stats for group, stats in groups.items()}
+
+
+class GrowableArray:
+    """1-D numpy buffer with amortized O(1) appends"""
+
+    def __init__(self, dtype, initial_capacity=1024):
+        self._buffer = np.zeros(initial_capacity, dtype=dtype)
+        self.size = 0
+
+    def append(self, value):
+        if self.size == len(self._buffer):
+            buffer = np.zeros(len(self._buffer) * 2, dtype=self._buffer.dtype)
+            buffer[:self.size] = self._buffer
+            self._buffer = buffer
+        self._buffer[self.size] = value
+        self.size += 1
+
+    def __setitem__(self, position, value):
+        self._buffer[position] = value
+
+    def copy(self):
+        clone = GrowableArray(self._buffer.dtype, initial_capacity=0)
+        clone._buffer = self._buffer.copy()
+        clone.size = self.size
+        return clone
+
+    def replace(self, values):
+        """Swap in new contents, keeping spare capacity for appends"""
+        self._buffer = np.zeros(max(len(values) * 2, 1024), dtype=self._buffer.dtype)
+        self._buffer[:len(values)] = values
+        self.size = len(values)
+
+    @property
+    def values(self):
+        return self._buffer[:self.size]
+
+
+class NumericColumns:
+    def __init__(self, entity_units=None):
+        self.entity_units = entity_units or ENTITY_UNITS
+        self.doc_rows = {}                        # doc_name -> current row
+        self.doc_types = []                       # code -> doc type
+        self.periods = []                         # code -> period
+        self._codes = {"doc_type": {}, "period": {}}
+        self.doc_type_codes = GrowableArray(np.int32)
+        self.period_codes = GrowableArray(np.int32)
+        self.alive = GrowableArray(bool)
+        self.columns = {entity: (GrowableArray(np.int32), GrowableArray(np.float64))
+                        for entity in self.entity_units}   # entity -> (doc rows, values)
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base):
+        columns = cls()
+        for doc_name, record in knowledge_base.items():
+            columns.add(doc_name, record)
+        return columns
+
+    def copy(self):
+        clone = NumericColumns(self.entity_units)
+        clone.doc_rows = dict(self.doc_rows)
+        clone.doc_types = list(self.doc_types)
+        clone.periods = list(self.periods)
+        clone._codes = {kind: dict(codes) for kind, codes in self._codes.items()}
+        clone.doc_type_codes = self.doc_type_codes.copy()
+        clone.period_codes = self.period_codes.copy()
+        clone.alive = self.alive.copy()
+        clone.columns = {entity: (doc_column.copy(), value_column.copy())
+                         for entity, (doc_column, value_column) in self.columns.items()}
+        return clone
+
+    def _code(self, kind, value, names):
+        codes = self._codes[kind]
+        if value not in codes:
+            codes[value] = len(names)
+            names.append(value)
+        return codes[value]
+
+    def add(self, doc_name, record):
+        """Parse a document's numeric entities into the columns, replacing an older version"""
+        self.remove(doc_name)
+        row = self.alive.size
+        self.doc_rows[doc_name] = row
+        self.doc_type_codes.append(self._code("doc_type", record.doc_type, self.doc_types))
+        self.period_codes.append(self._code("period", document_period(doc_name), self.periods))
+        self.alive.append(True)
+
+        for entity, value in record.entity_items():
+            unit = self.entity_units.get(entity)
+            if unit is None:
+                continue
+            number = PARSERS[unit](value)
+            if number is not None:
+                doc_column, value_column = self.columns[entity]
+                doc_column.append(row)
+                value_column.append(number)
+
+    def remove(self, doc_name):
+        row = self.doc_rows.pop(doc_name, None)
+        if row is None:
+            return
+        self.alive[row] = False
+        if self.alive.size > 1024 and len(self.doc_rows) < self.alive.size // 2:
+            self.compact()
+
+    def compact(self):
+        """Drop rows of removed documents and renumber the survivors"""
+        alive = self.alive.values
+        survivors = np.flatnonzero(alive)
+        new_rows = np.full(len(alive), -1, dtype=np.int32)
+        new_rows[survivors] = np.arange(len(survivors), dtype=np.int32)
+
+        for doc_column, value_column in self.columns.values():
+            keep = alive[doc_column.values]
+            value_column.replace(value_column.values[keep])
+            doc_column.replace(new_rows[doc_column.values[keep]])
+        self.doc_type_codes.replace(self.doc_type_codes.values[survivors])
+        self.period_codes.replace(self.period_codes.values[survivors])
+        self.alive.replace(np.ones(len(survivors), dtype=bool))
+        self.doc_rows = {doc_name: int(new_rows[row]) for doc_name, row in self.doc_rows.items()}
+
+    def rollup(self, entity, group_by="doc_type", doc_type=None, percentiles=(50, 90)):
+        """
+        Vectorized sum/avg/min/max/percentiles of an entity's values, grouped by
+        "doc_type", "period" or None (a single "all" group).
+        """
+        if entity not in self.columns:
+            raise ValueError(f"No numeric column for entity '{entity}'")
+        doc_column, value_column = self.columns[entity]
+        docs, values = doc_column.values, value_column.values
+
+        keep = self.alive.values[docs]
+        if doc_type is not None:
+            type_code = self._codes["doc_type"].get(doc_type, -1)
+            keep &= self.doc_type_codes.values[docs] == type_code
+        docs, values = docs[keep], values[keep]
+
+        if group_by == "doc_type":
+            codes, names = self.doc_type_codes.values[docs], self.doc_types
+        elif group_by == "period":
+            codes, names = self.period_codes.values[docs], self.periods
+        elif group_by is None:
+            codes, names = np.zeros(len(docs), dtype=np.int32), ["all"]
+        else:
+            raise ValueError(f"Unsupported group_by: {group_by}")
+
+        unit = self.entity_units[entity]
+        return {names[group]: {"unit": unit, **stats} for group, stats in grouped_stats(codes, values, percentiles).items()}
@@ -0,0 +1,237 @@
+"""
+Passages - Sentence offsets and token spans kept from ingestion for extractive answers
+Each indexed document keeps a few sentences per chunk - those with the most
+distinct index terms - with their document offsets plus the hashed index terms of
+each and their character spans. Answering scores the kept sentences inside the
+retrieved chunks and returns highlight spans straight from those arrays, without
+re-tokenizing the source.
+"""
+import heapq
+import re
+import zlib
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+import numpy as np
+
+from agents.snapshot import StringTable, pack_strings
+from agents.text_index import STOPWORDS, TOKEN_PATTERN
+
+# A sentence runs to ., ! or ? followed by whitespace, or to the end of the line
+SENTENCE_PATTERN = re.compile(r"\S[^\n]*?(?:[.!?](?=\s|$)|(?=\n)|$)")
+
+# Very long "sentences" (tables, minified text) are cut so one passage stays readable
+MAX_SENTENCE_CHARS = 600
+
+# Sentences kept per chunk, so passage memory grows with the chunk count rather than the corpus text
+MAX_SENTENCES_PER_CHUNK = 3
+
+
+def term_hash(term):
+    return zlib.crc32(term.encode("utf-8"))
+
+
+class DocumentPassages:
+    __slots__ = ("texts", "starts", "ends", "token_offsets", "token_hashes", "token_starts", "token_ends")
+
+    def __init__(self):
+        self.texts = []
+        self.starts = array("q")          # sentence start offsets in the document, ascending
+        self.ends = array("q")
+        self.token_offsets = array("i", [0])   # sentence i owns tokens token_offsets[i]:token_offsets[i + 1]
+        self.token_hashes = array("I")    # crc32 of each index term
+        self.token_starts = array("h")    # token spans relative to the sentence start (< MAX_SENTENCE_CHARS)
+        self.token_ends = array("h")
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add_text(self, text, offset, owned_length=None, limit=MAX_SENTENCES_PER_CHUNK):
+        """
+        Record up to limit sentences of a chunk that start in its owned region (the rest belongs to
+        the next chunk), preferring those with more distinct index terms; sentences without any
+        index term could never match a question and are not kept
+        """
+        candidates = []   # (-distinct terms, position, start, sentence, terms)
+        for match in SENTENCE_PATTERN.finditer(text):
+            if owned_length is not None and match.start() >= owned_length:
+                break
+            sentence = match.group()[:MAX_SENTENCE_CHARS]
+            terms = [token for token in TOKEN_PATTERN.finditer(sentence.lower()) if token.group() not in STOPWORDS]
+            if terms:
+                distinct = len({token.group() for token in terms})
+                candidates.append((-distinct, len(candidates), match.start(), sentence, terms))
+        if len(candidates) > limit:
+            candidates = sorted(heapq.nsmallest(limit, candidates, key=lambda item: item[:2]), key=lambda item: item[1])
+
+        for _, _, start, sentence, terms in candidates:
+            self.texts.append(sentence)
+            self.starts.append(offset + start)
+            self.ends.append(offset + start + len(sentence))
+            for token in terms:
+                self.token_hashes.append(term_hash(token.group()))
+                self.token_starts.append(token.start())
+                self.token_ends.append(token.end())
+            self.token_offsets.append(len(self.token_hashes))
+
+    def freeze(self):
+        self.texts = tuple(self.texts)
+        return self
+
+    def sentences_between(self, start, end):
+        """Indexes of the sentences starting inside [start, end)"""
+        return range(bisect_left(self.starts, start), bisect_left(self.starts, end))
+
+    def match(self, sentence, weights):
+        """(score, highlight spans) for one sentence given {term hash: weight}"""
+        score = 0.0
+        matched = set()
+        spans = []
+        for position in range(self.token_offsets[sentence], self.token_offsets[sentence + 1]):
+            weight = weights.get(self.token_hashes[position])
+            if weight is None:
+                continue
+            spans.append((int(self.token_starts[position]), int(self.token_ends[position])))
+            if self.token_hashes[position] not in matched:
+                matched.add(self.token_hashes[position])
+                score += weight
+        return score, spans
+
+
+class PassageStore:
+    """doc_name -> DocumentPassages; published states share entries, which are never modified"""
+
+    def __init__(self, documents=None):
+        self.documents = documents if documents is not None else {}
+
+    def __contains__(self, doc_name):
+        return doc_name in self.documents
+
+    def get(self, doc_name):
+        return self.documents.get(doc_name)
+
+    def copy(self):
+        # Entries of a loaded snapshot stay views over its mapped arrays
+        return PassageStore(dict(self.documents.items()))
+
+    def add(self, doc_name, passages):
+        self.documents[doc_name] = passages
+
+    def remove(self, doc_name):
+        self.documents.pop(doc_name, None)
+
+    def best(self, chunk_hits, spans, weights, limit=3):
+        """
+        Top sentences within the given chunks. chunk_hits are ((doc_name, chunk_index), score)
+        in rank order and spans their (start, end) offsets; ties go to the higher-ranked chunk.
+        """
+        scored = []
+        for rank, (((doc_name, chunk_index), _), (start, end)) in enumerate(zip(chunk_hits, spans)):
+            passages = self.documents.get(doc_name)
+            if passages is None:
+                continue
+            for sentence in passages.sentences_between(start, end):
+                score, highlights = passages.match(sentence, weights)
+                if score > 0:
+                    scored.append((-score, rank, int(passages.starts[sentence]), doc_name, chunk_index, sentence,
+                                   highlights))
+        scored.sort(key=lambda item: item[:3])
+
+        results = []
+        for negative_score, _, _, doc_name, chunk_index, sentence, highlights in scored[:limit]:
+            passages = self.documents[doc_name]
+            results.append({
+                "document": doc_name,
+                "chunk": chunk_index,
+                "start": int(passages.starts[sentence]),
+                "end": int(passages.ends[sentence]),
+                "text": passages.texts[sentence],
+                "score": round(-negative_score, 4),
+                "highlights": [list(span) for span in highlights]   # offsets within "text"
+            })
+        return results
+
+    # Snapshot support
+
+    def to_snapshot(self):
+        names = sorted(self.documents)
+        documents = [self.documents[doc_name] for doc_name in names]
+        sentence_counts = [len(passages) for passages in documents]
+        token_counts = [len(passages.token_hashes) for passages in documents]
+        token_bases = np.concatenate([[0], np.cumsum(token_counts, dtype=np.int64)])[:-1]
+
+        arrays = {}
+        arrays["passage_names.blob"], arrays["passage_names.offsets"] = pack_strings(names)
+        arrays["passage_doc_offsets"] = np.concatenate([[0], np.cumsum(sentence_counts, dtype=np.int64)]).astype(np.int64)
+        arrays["passages.blob"], arrays["passages.offsets"] = pack_strings(
+            [text for passages in documents for text in passages.texts])
+        arrays["passage_starts"] = np.array([start for passages in documents for start in passages.starts], dtype=np.int64)
+        arrays["passage_ends"] = np.array([end for passages in documents for end in passages.ends], dtype=np.int64)
+        arrays["passage_token_offsets"] = np.concatenate(
+            [[0]] + [np.array(passages.token_offsets, dtype=np.int64)[1:] + base
+                     for passages, base in zip(documents, token_bases)]).astype(np.int64)
+        for name, dtype in (("token_hashes", np.uint32), ("token_starts", np.int32), ("token_ends", np.int32)):
+            arrays["passage_" + name] = np.concatenate(
+                [np.zeros(0, dtype=dtype)] + [np.array(getattr(passages, name), dtype=dtype) for passages in documents])
+        return arrays
+
+    @classmethod
+    def from_snapshot(cls, arrays):
+        if "passage_names.blob" not in arrays:
+            return cls()
+        return cls(FrozenPassages(arrays))
+
+
+class _TableSlice:
+    """Rows first:last of a StringTable, decoded on access"""
+
+    def __init__(self, table, first, last):
+        self.table = table
+        self.first = first
+        self.last = last
+
+    def __len__(self):
+        return self.last - self.first
+
+    def __getitem__(self, row):
+        return self.table[self.first + row]
+
+    def __iter__(self):
+        return (self.table[row] for row in range(self.first, self.last))
+
+
+class FrozenPassages(Mapping):
+    """Read-only doc_name -> DocumentPassages view over snapshot arrays; entries are slices, not copies"""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.names = StringTable(arrays["passage_names.blob"], arrays["passage_names.offsets"])
+        self.texts = StringTable(arrays["passages.blob"], arrays["passages.offsets"])
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, doc_name):
+        return self.names.find(doc_name) is not None
+
+    def __getitem__(self, doc_name):
+        row = self.names.find(doc_name)
+        if row is None:
+            raise KeyError(doc_name)
+        arrays = self.arrays
+        first, last = int(arrays["passage_doc_offsets"][row]), int(arrays["passage_doc_offsets"][row + 1])
+        token_first, token_last = int(arrays["passage_token_offsets"][first]), int(arrays["passage_token_offsets"][last])
+
+        passages = DocumentPassages()
+        passages.texts = _TableSlice(self.texts, first, last)
+        passages.starts = arrays["passage_starts"][first:last]
+        passages.ends = arrays["passage_ends"][first:last]
+        passages.token_offsets = arrays["passage_token_offsets"][first:last + 1] - token_first
+        passages.token_hashes = arrays["passage_token_hashes"][token_first:token_last]
+        passages.token_starts = arrays["passage_token_starts"][token_first:token_last]
+        passages.token_ends = arrays["passage_token_ends"][token_first:token_last]
+        return passages
@@ -3,10 +3,18 @@ Router Agent - Intelligently routes requests to appropriate services
 This demonstrates multi-agent orchestration and intent recognition
 """
 import json
+import random
 import re
+import time
+
+from agents.keyword_matcher import KeywordMatcher
+from agents.lru_cache import MISSING, LRUCache, normalize_text
+
+# Characters that make a pattern a real regex rather than a plain keyword
+REGEX_SYNTAX = re.compile(r"[.^$*+?{}\[\]\\|()]")
 
 class RouterAgent:
-    def __init__(self):
+    def __init__(self, classifier=None, cache_size=4096, cache_ttl=None):
         self.patterns = {
             "bigquery": [
                 r"query", r"select", r"analyze", r"data", r"table", r"dataset",
@@ -21,27 +29,121 @@ class RouterAgent:
                 r"pipeline", r"process"
             ]
         }
+        # First intent with a matching keyword wins, otherwise "general_query"
+        self.intent_keywords = {
+            "data_analysis": ["query", "select", "analyze", "report"],
+            "document_management": ["file", "document", "upload", "storage"],
+            "workflow_automation": ["send", "email", "workflow"]
+        }
+        # Per service: first (keywords, action) rule with a matching keyword wins; () always matches
+        self.action_rules = {
+            "bigquery": [
+                (("sample", "demo"), "create_sample_table"),
+                (("analyze", "report"), "get_claim_analytics"),
+                (("list", "show"), "list_datasets"),
+                ((), "list_datasets")
+            ],
+            "gcs": [
+                (("sample", "demo"), "create_sample_documents"),
+                (("list", "show"), "list_files"),
+                ((), "list_files")
+            ]
+        }
+        # Optional trained IntentClassifier; the keyword rules decide whenever it is unsure
+        self.classifier = classifier
+        # Routing decisions by normalized input; cleared whenever the tables or the classifier change
+        self.decision_cache = LRUCache(cache_size, cache_ttl)
+        self.compile_patterns()
         print("✅ Router Agent initialized")
     
+    def compile_patterns(self):
+        """
+        Compile every keyword table into one Aho-Corasick matcher - call again after
+        editing patterns, intent_keywords or action_rules (this also drops cached
+        decisions). Patterns that use regex syntax are kept as individual regexes.
+        """
+        keyword_services = {}
+        regex_patterns = []
+        for service, patterns in self.patterns.items():
+            for pattern in patterns:
+                if REGEX_SYNTAX.search(pattern):
+                    regex_patterns.append((service, re.compile(pattern)))
+                else:
+                    keyword_services.setdefault(pattern, []).append(service)
+        
+        keywords = list(keyword_services)
+        keywords += [word for words in self.intent_keywords.values() for word in words]
+        keywords += [word for rules in self.action_rules.values() for words, _ in rules for word in words]
+        self._matcher = KeywordMatcher(keywords)
+        self._keyword_services = keyword_services
+        self._regex_patterns = regex_patterns
+        self._invalidate()
+    
+    def set_classifier(self, classifier):
+        """Swap in a (re)trained IntentClassifier, or None to route by keywords only"""
+        self.classifier = classifier
+        self._invalidate()
+    
+    def _invalidate(self):
+        self.decision_cache.clear()
+        self._last_decision = (None, None)
+    
+    def _cache_key(self, user_input):
+        # Keywords never contain punctuation, so dropping it cannot change a keyword match;
+        # regex patterns may depend on it, so with any of those only case is normalized
+        if self._regex_patterns:
+            return user_input.lower()
+        return normalize_text(user_input)
+    
+    def _match(self, user_input_lower):
+        """
+        (keywords found, services matched by regex patterns, classifier services or None)
+        - everything routing depends on
+        """
+        found = frozenset(self._matcher.find_all(user_input_lower))
+        regex_services = frozenset(service for service, regex in self._regex_patterns if regex.search(user_input_lower))
+        predicted = self.classifier.predict(user_input_lower) if self.classifier is not None else None
+        return found, regex_services, frozenset(predicted) if predicted is not None else None
+    
+    def _decision(self, user_input):
+        """
+        (keywords found, intent analysis, actions) for the input - from the decision cache,
+        or one pass of the matcher. The last input's decision is kept, so analyze_intent
+        followed by route_to_services costs a single lookup.
+        """
+        last_input, decision = self._last_decision
+        if last_input == user_input:
+            return decision
+        
+        key = self._cache_key(user_input)
+        decision = self.decision_cache.get(key)
+        if decision is MISSING:
+            signals = self._match(user_input.lower())
+            analysis = self._analyze(user_input, signals)
+            decision = (signals[0], analysis, self._actions(signals[0], analysis["required_services"]))
+            self.decision_cache.put(key, decision)
+        self._last_decision = (user_input, decision)
+        return decision
+    
     def analyze_intent(self, user_input):
         """Analyze user input to determine intent and required services"""
-        user_input_lower = user_input.lower()
+        analysis = self._decision(user_input)[1]
+        return {**analysis, "required_services": list(analysis["required_services"])}
+    
+    def _analyze(self, user_input, signals):
+        found, regex_services, predicted = signals
         
-        # Determine required services
-        required_services = []
-        for service, patterns in self.patterns.items():
-            if any(re.search(pattern, user_input_lower) for pattern in patterns):
-                required_services.append(service)
+        # Determine required services, in pattern-table order; a confident classifier overrides the keywords
+        if predicted is not None:
+            matched_services = predicted
+        else:
+            matched_services = {service for keyword in found for service in self._keyword_services.get(keyword, ())}
+            matched_services.update(regex_services)
+        required_services = [service for service in self.patterns if service in matched_services]
         
         # Determine primary intent
-        if any(word in user_input_lower for word in ["query", "select", "analyze", "report"]):
-            primary_intent = "data_analysis"
-        elif any(word in user_input_lower for word in ["file", "document", "upload", "storage"]):
-            primary_intent = "document_management"
-        elif any(word in user_input_lower for word in ["send", "email", "workflow"]):
-            primary_intent = "workflow_automation"
-        else:
-            primary_intent = "general_query"
+        primary_intent = next((intent for intent, words in self.intent_keywords.items()
+                               if not found.isdisjoint(words)), "general_query")
         
         # Generate reasoning
         reasoning = self._generate_reasoning(user_input, required_services, primary_intent)
@@ -50,7 +152,8 @@ class RouterAgent:
             "primary_intent": primary_intent,
             "required_services": required_services,
             "reasoning": reasoning,
-            "confidence": "high" if required_services else "medium"
+            "confidence": "high" if required_services else "medium",
+            "routed_by": "classifier" if predicted is not None else "keywords"
         }
     
     def _generate_reasoning(self, user_input, services, intent):
@@ -68,28 +171,82 @@ class RouterAgent:
     
     def route_to_services(self, user_input, intent_analysis):
         """Route the request to appropriate services based on analysis"""
+        found, analysis, actions = self._decision(user_input)
+        if intent_analysis["required_services"] != analysis["required_services"]:
+            return self._actions(found, intent_analysis["required_services"])
+        return [{**action, "params": dict(action["params"])} for action in actions]
+    
+    def _actions(self, found, required_services):
         actions = []
-        user_input_lower = user_input.lower()
-        
-        if "bigquery" in intent_analysis["required_services"]:
-            if "sample" in user_input_lower or "demo" in user_input_lower:
-                actions.append({"service": "bigquery", "action": "create_sample_table", "params": {}})
-            elif "analyze" in user_input_lower or "report" in user_input_lower:
-                actions.append({"service": "bigquery", "action": "get_claim_analytics", "params": {}})
-            elif "list" in user_input_lower or "show" in user_input_lower:
-                actions.append({"service": "bigquery", "action": "list_datasets", "params": {}})
-            else:
-                actions.append({"service": "bigquery", "action": "list_datasets", "params": {}})
-        
-        if "gcs" in intent_analysis["required_services"]:
-            if "sample" in user_input_lower or "demo" in user_input_lower:
-                actions.append({"service": "gcs", "action": "create_sample_documents", "params": {}})
-            elif "list" in user_input_lower or "show" in user_input_lower:
-                actions.append({"service": "gcs", "action": "list_files", "params": {}})
-            else:
-                actions.append({"service": "gcs", "action": "list_files", "params": {}})
+        for service, rules in self.action_rules.items():
+            if service not in required_services:
+                continue
+            for words, action in rules:
+                if not words or not found.isdisjoint(words):
+                    actions.append({"service": service, "action": action, "params": {}})
+                    break
         
         return actions
+    
+    def get_cache_stats(self):
+        return self.decision_cache.get_stats()
+    
+    def route_batch(self, user_inputs, compact=False):
+        """
+        Route many inputs at once - for bulk backfills. Each decision is the intent
+        analysis plus its "actions". Inputs that differ only in case, or that produce
+        the same keyword signals, share one decision object (treat them as read-only).
+        With compact=True, returns {"decisions": [distinct decisions], "assignments":
+        [decision index per input]} instead of one decision per input.
+        """
+        decision_ids = {}   # signals -> position in decisions
+        text_ids = {}       # lowercased input -> position in decisions
+        decisions = []
+        assignments = []
+        for user_input in user_inputs:
+            user_input_lower = user_input.lower()
+            position = text_ids.get(user_input_lower)
+            if position is None:
+                signals = self._match(user_input_lower)
+                position = decision_ids.get(signals)
+                if position is None:
+                    analysis = self._analyze(user_input, signals)
+                    analysis["actions"] = self._actions(signals[0], analysis["required_services"])
+                    position = decision_ids[signals] = len(decisions)
+                    decisions.append(analysis)
+                text_ids[user_input_lower] = position
+            assignments.append(position)
+        
+        if compact:
+            return {"decisions": decisions, "assignments": assignments}
+        return [decisions[position] for position in assignments]
+
+def benchmark_batch_routing(num_requests=20000, seed=7):
+    """Requests/sec of route_batch versus analyze_intent + route_to_services per request"""
+    rng = random.Random(seed)
+    verbs = ["Show", "Analyze", "Upload", "Send", "List", "Create", "Retrieve", "Process", "Notify about"]
+    subjects = ["claims data", "fraud report", "contract document", "sample dataset", "storage files",
+                "quarterly analytics", "the workflow", "an email", "demo table", "pdf invoices"]
+    requests = [f"{rng.choice(verbs)} {rng.choice(subjects)} for account {rng.randrange(5000)}"
+                for _ in range(num_requests)]
+    
+    router = RouterAgent()
+    start = time.perf_counter()
+    for user_input in requests:
+        router.route_to_services(user_input, router.analyze_intent(user_input))
+    per_call_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    batch = router.route_batch(requests, compact=True)
+    batch_seconds = time.perf_counter() - start
+    
+    return {
+        "requests": num_requests,
+        "distinct_decisions": len(batch["decisions"]),
+        "per_call_requests_per_sec": round(num_requests / per_call_seconds),
+        "batch_requests_per_sec": round(num_requests / batch_seconds),
+        "speedup": round(per_call_seconds / batch_seconds, 2)
+    }
 
 # Example usage
 if __name__ == "__main__":
@@ -108,3 +265,6 @@ if __name__ == "__main__":
         actions = router.route_to_services(query, analysis)
         print(f"📡 Routing: {analysis}")
         print(f"🎯 Actions: {actions}")
+    
+    print("\n🏁 Batch routing benchmark")
+    print(benchmark_batch_routing())
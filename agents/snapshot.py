@@ -0,0 +1,404 @@
+"""
+Snapshot - Versioned on-disk format for the RAG agent's knowledge and indexes
+Everything is stored as flat .npy arrays opened with mmap, so a cold start maps
+the files instead of parsing them and worker processes share the page cache
+
+Layout of <root>/v<N>/ (docs sorted by name, chunks grouped by doc):
+    manifest.json                         format version, counts, BM25/embedding params
+    doc_names.*, doc_types, digests.*, generations
+    doc_chunk_offsets, chunk_doc, chunk_starts, chunk_ends, chunk_lengths
+    terms.*, term_offsets, posting_rows, posting_tfs      BM25 postings (CSR)
+    entity_offsets, entity_names, entity_values.*          entity table
+    vectors                                                (chunks, dim) float32
+    dedup_names.*, dedup_signatures                        MinHash signatures (optional)
+    passage_*, passages.*                                  sentence offsets and term spans (optional)
+<root>/CURRENT names the live version and is replaced atomically. Concurrent
+writers (threads or instances sharing root) stage in private directories and
+claim version numbers with mkdir, so a published v<N> is always one writer's.
+"""
+import json
+import math
+import os
+import shutil
+import uuid
+from collections.abc import Mapping
+
+import numpy as np
+
+from agents.document_record import DocumentRecord
+from agents.text_index import BM25Index
+from agents.vector_index import DenseVectorIndex, top_k_candidate_rows, top_k_rows
+
+SNAPSHOT_FORMAT = "rag-snapshot"
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def pack_strings(strings):
+    """Concatenate strings into one UTF-8 blob plus an offsets array"""
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class StringTable:
+    """Read-only string array over a (blob, offsets) pair, decoded on access"""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.blob[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+    def find(self, value):
+        """Binary search a sorted table, returning the row or None"""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self[middle] < value:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < len(self) and self[low] == value else None
+
+
+class ChunkTable:
+    """Maps chunk rows to (doc_name, chunk index) ids and back"""
+
+    def __init__(self, doc_names, doc_chunk_offsets, chunk_doc):
+        self.doc_names = doc_names
+        self.doc_chunk_offsets = doc_chunk_offsets
+        self.chunk_doc = chunk_doc
+
+    def __len__(self):
+        return len(self.chunk_doc)
+
+    def chunk_id(self, row):
+        doc_row = int(self.chunk_doc[row])
+        return (self.doc_names[doc_row], row - int(self.doc_chunk_offsets[doc_row]))
+
+    def row(self, chunk_id):
+        doc_name, chunk_index = chunk_id
+        doc_row = self.doc_names.find(doc_name)
+        if doc_row is None:
+            return None
+        start, end = int(self.doc_chunk_offsets[doc_row]), int(self.doc_chunk_offsets[doc_row + 1])
+        return start + chunk_index if 0 <= chunk_index < end - start else None
+
+    def mask(self, candidates):
+        mask = np.zeros(len(self), dtype=bool)
+        rows = [self.row(chunk_id) for chunk_id in candidates]
+        mask[[row for row in rows if row is not None]] = True
+        return mask
+
+
+class FrozenKnowledgeBase(Mapping):
+    """Read-only knowledge_base view; records are decoded from the entity table on access"""
+
+    def __init__(self, arrays, chunks, doc_types, entity_names):
+        self.arrays = arrays
+        self.chunks = chunks
+        self.doc_types = doc_types
+        self.entity_names = entity_names
+        self.digests = StringTable(arrays["digests.blob"], arrays["digests.offsets"])
+        self.entity_values = StringTable(arrays["entity_values.blob"], arrays["entity_values.offsets"])
+
+    def __len__(self):
+        return len(self.chunks.doc_names)
+
+    def __iter__(self):
+        return iter(self.chunks.doc_names)
+
+    def __getitem__(self, doc_name):
+        row = self.chunks.doc_names.find(doc_name)
+        if row is None:
+            raise KeyError(doc_name)
+        return self.record(row)
+
+    def record(self, row):
+        arrays = self.arrays
+        entities = {}
+        for entity_row in range(int(arrays["entity_offsets"][row]), int(arrays["entity_offsets"][row + 1])):
+            entity = self.entity_names[arrays["entity_names"][entity_row]]
+            entities.setdefault(entity, []).append(self.entity_values[entity_row])
+
+        start, end = int(self.chunks.doc_chunk_offsets[row]), int(self.chunks.doc_chunk_offsets[row + 1])
+        generation = int(arrays["generations"][row])
+        return DocumentRecord(
+            self.doc_types[arrays["doc_types"][row]],
+            entities,
+            zip(arrays["chunk_starts"][start:end].tolist(), arrays["chunk_ends"][start:end].tolist()),
+            self.digests[row] or None,
+            None if generation < 0 else generation
+        )
+
+
+class FrozenBM25Index:
+    """BM25 over CSR postings; scores are accumulated with numpy instead of dicts"""
+
+    def __init__(self, arrays, chunks, total_length, k1, b):
+        self.terms = StringTable(arrays["terms.blob"], arrays["terms.offsets"])
+        self.term_offsets = arrays["term_offsets"]
+        self.posting_rows = arrays["posting_rows"]
+        self.posting_tfs = arrays["posting_tfs"]
+        self.chunk_lengths = arrays["chunk_lengths"]
+        self.chunks = chunks
+        self.total_length = total_length
+        self.k1 = k1
+        self.b = b
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def __contains__(self, chunk_id):
+        return self.chunks.row(chunk_id) is not None
+
+    def idf(self, term):
+        term_row = self.terms.find(term)
+        df = 0 if term_row is None else int(self.term_offsets[term_row + 1]) - int(self.term_offsets[term_row])
+        n = len(self.chunks)
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query_tokens, k=3, candidates=None):
+        n = len(self.chunks)
+        if not n:
+            return []
+
+        avg_length = self.total_length / n or 1.0
+        scores = np.zeros(n, dtype=np.float64)
+        for term in set(query_tokens):
+            term_row = self.terms.find(term)
+            if term_row is None:
+                continue
+            start, end = int(self.term_offsets[term_row]), int(self.term_offsets[term_row + 1])
+            rows = self.posting_rows[start:end]
+            tfs = self.posting_tfs[start:end].astype(np.float64)
+            idf = math.log(1.0 + (n - (end - start) + 0.5) / ((end - start) + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self.chunk_lengths[rows] / avg_length)
+            scores[rows] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+        if candidates is not None:
+            scores[~self.chunks.mask(candidates)] = 0.0
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [(self.chunks.chunk_id(int(row)), float(scores[row])) for row in matched]
+
+
+class FrozenVectorIndex:
+    """Dense index over a read-only (chunks, dim) matrix mapped from disk"""
+
+    def __init__(self, matrix, chunks, query_batch_size=256):
+        self.matrix = matrix
+        self.chunks = chunks
+        self.dim = matrix.shape[1]
+        self.query_batch_size = query_batch_size
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def __contains__(self, chunk_id):
+        return self.chunks.row(chunk_id) is not None
+
+    def search(self, queries, k=3, candidates=None):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if candidates is not None:
+            rows = [row for row in map(self.chunks.row, candidates) if row is not None]
+            hits = top_k_candidate_rows(queries, self.matrix, rows, k, self.query_batch_size)
+        else:
+            hits = top_k_rows(queries, self.matrix, np.ones(len(self.chunks), dtype=bool), k, self.query_batch_size)
+        return [[(self.chunks.chunk_id(row), score) for row, score in query_hits] for query_hits in hits]
+
+
+def _write_array(directory, name, array):
+    np.save(os.path.join(directory, name + ".npy"), np.ascontiguousarray(array))
+
+
+def _read_array(directory, name):
+    path = os.path.join(directory, name + ".npy")
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        return np.load(path)  # zero-length arrays cannot be memory-mapped
+
+
+def save_snapshot(root, knowledge_base, index, vectors, duplicates=None, passages=None):
+    """Write a new snapshot version under root and point CURRENT at it"""
+    doc_names = sorted(knowledge_base)
+    records = [knowledge_base[doc_name] for doc_name in doc_names]
+    chunk_ids = [(doc_name, chunk_index)
+                 for doc_name, record in zip(doc_names, records)
+                 for chunk_index in range(record.chunk_count)]
+    chunk_rows = {chunk_id: row for row, chunk_id in enumerate(chunk_ids)}
+
+    doc_types = sorted({record.doc_type for record in records})
+    type_ids = {doc_type: position for position, doc_type in enumerate(doc_types)}
+    entity_names = sorted({entity for record in records for entity, _ in record.entity_items()})
+    entity_ids = {entity: position for position, entity in enumerate(entity_names)}
+
+    arrays = {}
+    arrays["doc_names.blob"], arrays["doc_names.offsets"] = pack_strings(doc_names)
+    arrays["doc_types"] = np.array([type_ids[record.doc_type] for record in records], dtype=np.int16)
+    arrays["digests.blob"], arrays["digests.offsets"] = pack_strings([record.digest or "" for record in records])
+    arrays["generations"] = np.array([-1 if record.generation is None else int(record.generation)
+                                      for record in records], dtype=np.int64)
+
+    chunk_counts = [record.chunk_count for record in records]
+    arrays["doc_chunk_offsets"] = np.concatenate([[0], np.cumsum(chunk_counts, dtype=np.int64)]).astype(np.int64)
+    arrays["chunk_doc"] = np.repeat(np.arange(len(records), dtype=np.int32), chunk_counts)
+    arrays["chunk_starts"] = np.array([start for record in records for start, _ in record.chunks], dtype=np.int64)
+    arrays["chunk_ends"] = np.array([end for record in records for _, end in record.chunks], dtype=np.int64)
+    arrays["chunk_lengths"] = np.array([index.doc_lengths[chunk_id] for chunk_id in chunk_ids], dtype=np.int32)
+
+    terms = sorted(index.postings)
+    term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    posting_rows, posting_tfs = [], []
+    for position, term in enumerate(terms):
+        postings = sorted((chunk_rows[chunk_id], tf) for chunk_id, tf in index.postings[term].items())
+        posting_rows.extend(row for row, _ in postings)
+        posting_tfs.extend(tf for _, tf in postings)
+        term_offsets[position + 1] = len(posting_rows)
+    arrays["terms.blob"], arrays["terms.offsets"] = pack_strings(terms)
+    arrays["term_offsets"] = term_offsets
+    arrays["posting_rows"] = np.array(posting_rows, dtype=np.int32)
+    arrays["posting_tfs"] = np.array(posting_tfs, dtype=np.int32)
+
+    entity_counts, entity_name_rows, entity_values = [], [], []
+    for record in records:
+        count = 0
+        for entity, value in record.entity_items():
+            entity_name_rows.append(entity_ids[entity])
+            entity_values.append(value)
+            count += 1
+        entity_counts.append(count)
+    arrays["entity_offsets"] = np.concatenate([[0], np.cumsum(entity_counts, dtype=np.int64)]).astype(np.int64)
+    arrays["entity_names"] = np.array(entity_name_rows, dtype=np.int32)
+    arrays["entity_values.blob"], arrays["entity_values.offsets"] = pack_strings(entity_values)
+
+    arrays["vectors"] = vectors.get_vectors(chunk_ids)
+    if duplicates is not None:
+        dedup_arrays, dedup_manifest = duplicates.to_snapshot()
+        arrays.update(dedup_arrays)
+    if passages is not None:
+        arrays.update(passages.to_snapshot())
+
+    os.makedirs(root, exist_ok=True)
+    staging = os.path.join(root, f".staging-{os.getpid()}-{uuid.uuid4().hex}")
+    os.makedirs(staging)
+    version = None
+    try:
+        for name, array in arrays.items():
+            _write_array(staging, name, array)
+        version = _claim_version(root)
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "version": version,
+            "documents": len(doc_names),
+            "chunks": len(chunk_ids),
+            "terms": len(terms),
+            "doc_types": doc_types,
+            "entity_names": entity_names,
+            "total_length": index.total_length,
+            "k1": index.k1,
+            "b": index.b,
+            "dim": vectors.dim
+        }
+        if duplicates is not None:
+            manifest["dedup"] = dedup_manifest
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        if version is not None:
+            os.rmdir(os.path.join(root, f"v{version}"))   # give the claimed number back
+        raise
+
+    # Renaming onto the claimed (still empty) directory publishes all files at once
+    os.replace(staging, os.path.join(root, f"v{version}"))
+    if (read_current_version(root) or 0) < version:   # a faster, newer writer may have moved CURRENT past us
+        pointer = os.path.join(root, f"CURRENT.{uuid.uuid4().hex}.tmp")
+        with open(pointer, "w") as f:
+            f.write(str(version))
+        os.replace(pointer, os.path.join(root, "CURRENT"))
+
+    # Keep the previous version around for processes that still have it mapped
+    for entry in os.listdir(root):
+        if entry.startswith("v") and entry[1:].isdigit() and int(entry[1:]) < version - 1:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    return manifest
+
+
+def _claim_version(root):
+    """Reserve the next version number by creating its directory; mkdir fails if another writer got it"""
+    existing = [int(entry[1:]) for entry in os.listdir(root) if entry.startswith("v") and entry[1:].isdigit()]
+    version = max(existing + [read_current_version(root) or 0]) + 1
+    while True:
+        try:
+            os.mkdir(os.path.join(root, f"v{version}"))
+            return version
+        except FileExistsError:
+            version += 1
+
+
+def read_current_version(root):
+    try:
+        with open(os.path.join(root, "CURRENT")) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def load_snapshot(root):
+    """Map the current snapshot -> (manifest, knowledge_base, index, vectors), all read-only"""
+    version = read_current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No snapshot found in {root}")
+    directory = os.path.join(root, f"v{version}")
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')} v{manifest.get('format_version')}")
+
+    arrays = {name[:-len(".npy")]: _read_array(directory, name[:-len(".npy")])
+              for name in os.listdir(directory) if name.endswith(".npy")}
+    doc_names = StringTable(arrays["doc_names.blob"], arrays["doc_names.offsets"])
+    chunks = ChunkTable(doc_names, arrays["doc_chunk_offsets"], arrays["chunk_doc"])
+
+    knowledge_base = FrozenKnowledgeBase(arrays, chunks, manifest["doc_types"], manifest["entity_names"])
+    index = FrozenBM25Index(arrays, chunks, manifest["total_length"], manifest["k1"], manifest["b"])
+    vectors = FrozenVectorIndex(arrays["vectors"], chunks)
+    return manifest, knowledge_base, index, vectors
+
+
+def thaw(knowledge_base, index, vectors):
+    """Copy a loaded snapshot into mutable structures - paid on first ingestion, not at startup"""
+    mutable_kb = {doc_name: knowledge_base.record(row) for row, doc_name in enumerate(knowledge_base)}
+
+    chunks = index.chunks
+    chunk_ids = [chunks.chunk_id(row) for row in range(len(chunks))]
+    mutable_index = BM25Index(k1=index.k1, b=index.b)
+    doc_terms = {chunk_id: [] for chunk_id in chunk_ids}
+    for term_row, term in enumerate(index.terms):
+        start, end = int(index.term_offsets[term_row]), int(index.term_offsets[term_row + 1])
+        rows = index.posting_rows[start:end].tolist()
+        mutable_index.postings[term] = dict(zip((chunk_ids[row] for row in rows), index.posting_tfs[start:end].tolist()))
+        for row in rows:
+            doc_terms[chunk_ids[row]].append(term)
+    mutable_index.doc_lengths = dict(zip(chunk_ids, index.chunk_lengths.tolist()))
+    mutable_index.doc_terms = {chunk_id: tuple(terms) for chunk_id, terms in doc_terms.items()}
+    mutable_index.total_length = index.total_length
+
+    mutable_vectors = DenseVectorIndex(vectors.dim, initial_capacity=max(len(chunk_ids), 1))
+    if chunk_ids:
+        mutable_vectors.add(chunk_ids, np.array(vectors.matrix))
+    return mutable_kb, mutable_index, mutable_vectors
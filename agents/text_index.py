@@ -0,0 +1,129 @@
+"""
+Text Index - BM25 inverted index used by the RAG agent for retrieval
+Keeps postings lists and document-length stats so ranking touches only
+the documents that share a term with the question
+"""
+import heapq
+import math
+import re
+from collections import Counter
+from operator import itemgetter
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "our", "please",
+    "show", "that", "the", "this", "to", "was", "what", "which", "with", "you"
+])
+
+
+def tokenize(text):
+    """Lowercase and split text into index terms, dropping stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}      # term -> {doc_id: term frequency}
+        self.doc_lengths = {}   # doc_id -> number of tokens
+        self.doc_terms = {}     # doc_id -> distinct terms, used to drop postings on removal
+        self.total_length = 0
+        self._owned = None      # terms whose postings this copy may write; None = all of them
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_lengths
+
+    def copy(self):
+        """Copy for a new index version; postings lists stay shared until first written (copy-on-write)"""
+        clone = BM25Index(self.k1, self.b)
+        clone.postings = dict(self.postings)
+        clone.doc_lengths = dict(self.doc_lengths)
+        clone.doc_terms = dict(self.doc_terms)
+        clone.total_length = self.total_length
+        clone._owned = set()
+        return clone
+
+    def _writable_posting(self, term):
+        posting = self.postings.get(term)
+        if posting is None:
+            posting = self.postings[term] = {}
+        elif self._owned is None or term in self._owned:
+            return posting
+        else:
+            posting = self.postings[term] = dict(posting)
+        if self._owned is not None:
+            self._owned.add(term)
+        return posting
+
+    def add_document(self, doc_id, tokens):
+        """Index a tokenized document, replacing any previous version of it"""
+        self.add_counts(doc_id, Counter(tokens), len(tokens))
+
+    def add_counts(self, doc_id, term_counts, length):
+        """Index precomputed {term: tf} counts, e.g. a partial index built in another process"""
+        if doc_id in self.doc_lengths:
+            self.remove_document(doc_id)
+
+        for term, tf in term_counts.items():
+            self._writable_posting(term)[doc_id] = tf
+
+        self.doc_lengths[doc_id] = length
+        self.doc_terms[doc_id] = tuple(term_counts)
+        self.total_length += length
+
+    def remove_document(self, doc_id):
+        """Drop a document and all of its postings"""
+        if doc_id not in self.doc_lengths:
+            return False
+
+        for term in self.doc_terms.pop(doc_id):
+            posting = self._writable_posting(term)
+            del posting[doc_id]
+            if not posting:
+                del self.postings[term]
+                if self._owned is not None:
+                    self._owned.discard(term)
+
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        return True
+
+    def idf(self, term):
+        """Okapi BM25 inverse document frequency (always non-negative)"""
+        df = len(self.postings.get(term, ()))
+        n = len(self.doc_lengths)
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query_tokens, k=3, candidates=None):
+        """Rank documents against the query and return the top-k (doc_id, score) pairs"""
+        if not self.doc_lengths:
+            return []
+
+        k1 = self.k1
+        b = self.b
+        avg_length = self.total_length / len(self.doc_lengths) or 1.0
+        doc_lengths = self.doc_lengths
+        scores = {}
+
+        for term in set(query_tokens):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf(term)
+            if candidates is None:
+                matches = posting.items()
+            elif len(candidates) < len(posting):
+                # Small candidate sets (e.g. entity filters) are probed instead of walking the posting
+                matches = [(doc_id, posting[doc_id]) for doc_id in candidates if doc_id in posting]
+            else:
+                matches = [(doc_id, tf) for doc_id, tf in posting.items() if doc_id in candidates]
+            for doc_id, tf in matches:
+                norm = k1 * (1.0 - b + b * doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1.0) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=itemgetter(1))
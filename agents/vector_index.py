@@ -0,0 +1,182 @@
+"""
+Vector Index - Dense embedding store for semantic retrieval in the RAG agent
+Embeddings live in one contiguous float32 matrix; queries are scored as a
+batched matrix multiply with argpartition top-k
+"""
+import zlib
+
+import numpy as np
+
+
+class Embedder:
+    """Embedding interface - swap in Vertex AI embeddings by implementing embed()"""
+    dim = 0
+
+    def embed(self, texts):
+        """Return an (len(texts), dim) float32 array of L2-normalized vectors"""
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """Offline default: signed hashed character n-grams, no model download needed"""
+
+    def __init__(self, dim=256, ngram_range=(3, 4)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _features(self, text):
+        padded = " " + " ".join(text.lower().split()) + " "
+        grams = []
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        # crc32 is stable across processes, unlike the salted built-in hash()
+        return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams),
+                           dtype=np.uint32, count=len(grams))
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = self._features(text)
+            if not len(hashes):
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class DenseVectorIndex:
+    def __init__(self, dim, initial_capacity=1024, growth_factor=2.0, query_batch_size=256):
+        self.dim = dim
+        self.growth_factor = growth_factor
+        self.query_batch_size = query_batch_size
+        self._matrix = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._alive = np.zeros(initial_capacity, dtype=bool)
+        self._ids = []     # row -> doc id
+        self._rows = {}    # doc id -> row
+        self.count = 0     # rows in use, including removed ones
+        self._owns_matrix = True
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._rows
+
+    @property
+    def capacity(self):
+        return self._matrix.shape[0]
+
+    def copy(self):
+        """
+        Copy for a new index version. The matrix is shared: the copy only appends
+        past the original's rows, and compacts into a fresh matrix.
+        """
+        clone = DenseVectorIndex(self.dim, initial_capacity=0, growth_factor=self.growth_factor,
+                                 query_batch_size=self.query_batch_size)
+        clone._matrix = self._matrix
+        clone._alive = self._alive.copy()
+        clone._ids = list(self._ids)
+        clone._rows = dict(self._rows)
+        clone.count = self.count
+        clone._owns_matrix = False
+        return clone
+
+    def _reserve(self, rows_needed):
+        """Grow geometrically so appends copy the matrix O(log n) times in total"""
+        if rows_needed <= self.capacity:
+            return
+        new_capacity = max(rows_needed, int(self.capacity * self.growth_factor) + 1)
+        matrix = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        matrix[:self.count] = self._matrix[:self.count]
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self.count] = self._alive[:self.count]
+        self._matrix, self._alive = matrix, alive
+        self._owns_matrix = True
+
+    def add(self, doc_ids, vectors):
+        """Append vectors, replacing any existing vector for the same doc id"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        for doc_id in doc_ids:
+            self.remove(doc_id)
+
+        start = self.count
+        self._reserve(start + len(doc_ids))
+        self._matrix[start:start + len(doc_ids)] = vectors
+        self._alive[start:start + len(doc_ids)] = True
+        for offset, doc_id in enumerate(doc_ids):
+            self._rows[doc_id] = start + offset
+            self._ids.append(doc_id)
+        self.count += len(doc_ids)
+
+    def remove(self, doc_id):
+        """Tombstone a vector; rows are reclaimed once half of them are dead"""
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return False
+        self._alive[row] = False
+        if len(self._rows) < self.count // 2:
+            self.compact()
+        return True
+
+    def get_vectors(self, doc_ids):
+        """Stored vectors for the given doc ids, as an (n, dim) array"""
+        return self._matrix[[self._rows[doc_id] for doc_id in doc_ids]].reshape(-1, self.dim)
+
+    def compact(self):
+        """Drop tombstoned rows so the matrix stays dense"""
+        keep = np.flatnonzero(self._alive[:self.count])
+        if not (self._owns_matrix and self._matrix.flags.writeable):
+            self._matrix = np.array(self._matrix)  # detach from a shared matrix or read-only mmap
+            self._owns_matrix = True
+        self._matrix[:len(keep)] = self._matrix[keep]
+        self._alive[:len(keep)] = True
+        self._alive[len(keep):self.count] = False
+        self._ids = [self._ids[row] for row in keep]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self.count = len(keep)
+
+    def search(self, queries, k=3, candidates=None):
+        """Score a batch of query vectors and return top-k (doc_id, similarity) per query"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if not self._rows:
+            return [[] for _ in range(len(queries))]
+
+        matrix = self._matrix[:self.count]
+        if candidates is not None:
+            rows = [self._rows[doc_id] for doc_id in candidates if doc_id in self._rows]
+            hits = top_k_candidate_rows(queries, matrix, rows, k, self.query_batch_size)
+        else:
+            hits = top_k_rows(queries, matrix, self._alive[:self.count], k, self.query_batch_size)
+        return [[(self._ids[row], score) for row, score in query_hits] for query_hits in hits]
+
+
+def top_k_rows(queries, matrix, mask, k, batch_size=256):
+    """Batched dot-product top-k over the rows of matrix allowed by mask -> [[(row, score)]]"""
+    k = min(k, int(mask.sum()))
+    if k <= 0:
+        return [[] for _ in range(len(queries))]
+
+    results = []
+    for start in range(0, len(queries), batch_size):
+        scores = queries[start:start + batch_size] @ matrix.T
+        scores[:, ~mask] = -np.inf
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        for rows, row_scores in zip(np.take_along_axis(top, order, axis=1),
+                                    np.take_along_axis(top_scores, order, axis=1)):
+            results.append([(int(row), float(score)) for row, score in zip(rows, row_scores)])
+    return results
+
+
+def top_k_candidate_rows(queries, matrix, rows, k, batch_size=256):
+    """top_k_rows over only the given rows - gathers them so cost scales with the candidates, not the matrix"""
+    rows = np.sort(np.asarray(rows, dtype=np.int64))
+    hits = top_k_rows(queries, matrix[rows], np.ones(len(rows), dtype=bool), k, batch_size)
+    return [[(int(rows[position]), score) for position, score in query_hits] for query_hits in hits]
@@ -16,6 +16,37 @@ class GCPConfig:
     
     # Vertex AI settings (we'll use Gemini API)
     VERTEX_AI_LOCATION = "us-central1"
+    
+    # RAG index snapshot - point at a shared volume (e.g. a GCS FUSE mount) so new instances start warm
+    RAG_SNAPSHOT_DIR = os.getenv('RAG_SNAPSHOT_DIR', '/tmp/rag_snapshot')
+    
+    # Process-pool workers for RAG ingestion - set to the instance's vCPU count
+    RAG_INGEST_WORKERS = int(os.getenv('RAG_INGEST_WORKERS', '1'))
+    
+    # Time each extraction rule alone on every Nth chunk (per-rule costs in /status); 0 = off
+    RAG_EXTRACTION_PROFILE_EVERY = int(os.getenv('RAG_EXTRACTION_PROFILE_EVERY', '0'))
+    
+    # Routed action execution - pool threads shared by all requests, per-action timeout in seconds
+    ACTION_WORKERS = int(os.getenv('ACTION_WORKERS', '8'))
+    ACTION_TIMEOUT = float(os.getenv('ACTION_TIMEOUT', '30'))
+    
+    # Pooled BigQuery / GCS HTTP sessions - keep pool size at or above ACTION_WORKERS
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '4'))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '16'))
+    
+    # run_query result cache - total size bound in bytes, and seconds before an entry is re-queried regardless
+    QUERY_CACHE_MAX_BYTES = int(os.getenv('QUERY_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    QUERY_CACHE_TTL = float(os.getenv('QUERY_CACHE_TTL', '300'))
+    
+    # Rows per page fetched by streaming queries (/api/query/stream/<name>)
+    QUERY_PAGE_SIZE = int(os.getenv('QUERY_PAGE_SIZE', '1000'))
+    
+    # Seconds a confirmed bucket / dataset / seeded table is trusted before it is checked again
+    READINESS_TTL = float(os.getenv('READINESS_TTL', '600'))
+    
+    # Router intent classifier - trained model file, plus an optional JSON Lines file of labeled requests
+    ROUTER_MODEL_PATH = os.getenv('ROUTER_MODEL_PATH', '/tmp/router_intent_model.npz')
+    ROUTER_LABELS_PATH = os.getenv('ROUTER_LABELS_PATH', '')
 
 # Service account keys for different services
 SERVICE_ACCOUNTS = {
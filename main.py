@@ -3,10 +3,12 @@ Enterprise RAG & Workflow Automation Hub
 Main application that orchestrates MCP servers and AI agents
 This demonstrates production-level system architecture
 """
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 import json
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 # Add our modules to path
 sys.path.append('mcp_servers')
@@ -14,16 +16,26 @@ sys.path.append('agents')
 sys.path.append('configs')
 
 # Import our components
-from mcp_servers.bigquery_server import handle_bigquery_request
+from mcp_servers.bigquery_server import handle_bigquery_request, query_cache, get_server as get_bigquery_server
 from mcp_servers.gcs_server import handle_gcs_request
+from mcp_servers.readiness import readiness
+from agents.action_plan import ActionPlan
 from agents.router_agent import RouterAgent
+from agents.intent_classifier import IntentClassifier, examples_from_history, load_examples
 from agents.rag_agent import RAGAgent
+from configs.gcp_config import GCPConfig
 
 app = Flask(__name__)
 
 # Initialize agents
-router_agent = RouterAgent()
-rag_agent = RAGAgent()
+router_agent = RouterAgent(IntentClassifier.load(GCPConfig.ROUTER_MODEL_PATH)
+                           if os.path.exists(GCPConfig.ROUTER_MODEL_PATH) else None)
+rag_agent = RAGAgent(ingest_workers=GCPConfig.RAG_INGEST_WORKERS,
+                     extraction_profile_every=GCPConfig.RAG_EXTRACTION_PROFILE_EVERY)
+rag_agent.load_snapshot(GCPConfig.RAG_SNAPSHOT_DIR)
+
+# Shared by all requests; routed actions are I/O bound, so threads overlap their latencies
+action_pool = ThreadPoolExecutor(max_workers=GCPConfig.ACTION_WORKERS, thread_name_prefix="action")
 
 print("🚀 Enterprise RAG & Workflow Automation Hub Starting...")
 print("✅ MCP Servers: BigQuery, GCS")
@@ -47,34 +59,22 @@ class EnterpriseAutomationHub:
         actions = router_agent.route_to_services(user_input, intent_analysis)
         print(f"🎯 Actions: {actions}")
         
-        # Step 3: Execute actions
+        # Step 3: Execute actions - independent ones concurrently, RAG ingestion once its documents exist
+        plan = ActionPlan()
+        steps = []
+        for position, action in enumerate(actions):
+            step = plan.add(f"{position}:{action['service']}.{action['action']}", partial(self._execute_action, action),
+                            timeout=action.get("timeout", GCPConfig.ACTION_TIMEOUT))
+            steps.append(step)
+            if action["service"] == "gcs" and action["action"] == "create_sample_documents":
+                plan.add(f"{step}:rag_ingest", self._ingest_sample_documents, depends_on=(step,))
+        outcomes = plan.execute(action_pool, GCPConfig.ACTION_TIMEOUT)
+        
         results = []
-        for action in actions:
-            service = action["service"]
-            action_name = action["action"]
-            params = action.get("params", {})
-            
-            print(f"⚡ Executing: {service}.{action_name}")
-            
-            if service == "bigquery":
-                result = handle_bigquery_request(action_name, params)
-                results.append({"service": service, "action": action_name, "result": result})
-            
-            elif service == "gcs":
-                result = handle_gcs_request(action_name, params)
-                results.append({"service": service, "action": action_name, "result": result})
-                
-                # If we got documents, process them with RAG
-                if action_name == "create_sample_documents" and result.get("success"):
-                    print("📚 Processing documents with RAG...")
-                    # Simulate document processing for RAG
-                    sample_docs = [
-                        {"name": "contracts/contract_001.txt", "content": "CONTRACT AGREEMENT\nParties: Company A & Vendor B\nValue: $50,000\nTerm: 12 months\nRisk Level: Medium"},
-                        {"name": "reports/q4_2024_report.txt", "content": "Q4 2024 FINANCIAL REPORT\nRevenue: $1.2M\nExpenses: $800K\nProfit: $400K\nKey Metric: 15% growth"},
-                        {"name": "policies/security_policy.txt", "content": "SECURITY POLICY DOCUMENT\nCompliance: ISO 27001\nLast Review: 2024-01-15\nStatus: Active"}
-                    ]
-                    rag_result = rag_agent.process_documents(sample_docs)
-                    print(f"🧠 RAG processed {rag_result['processed_documents']} documents")
+        for action, step in zip(actions, steps):
+            outcome = outcomes[step]
+            result = outcome["result"] if outcome["success"] else {"success": False, "error": outcome["error"]}
+            results.append({"service": action["service"], "action": action["action"], "result": result})
         
         # Step 4: Generate response
         response = self._generate_response(user_input, intent_analysis, results)
@@ -91,6 +91,39 @@ class EnterpriseAutomationHub:
         
         return response
     
+    def _execute_action(self, action, inputs):
+        """Run one routed action against its MCP server"""
+        service = action["service"]
+        action_name = action["action"]
+        params = action.get("params", {})
+        
+        print(f"⚡ Executing: {service}.{action_name}")
+        
+        if service == "bigquery":
+            return handle_bigquery_request(action_name, params)
+        elif service == "gcs":
+            return handle_gcs_request(action_name, params)
+        return {"success": False, "error": f"Unknown service: {service}"}
+    
+    def _ingest_sample_documents(self, inputs):
+        """Index the sample documents with RAG once the GCS step that created them succeeded"""
+        (result,) = inputs.values()
+        if not result.get("success"):
+            return None
+        
+        print("📚 Processing documents with RAG...")
+        # Simulate document processing for RAG
+        sample_docs = [
+            {"name": "contracts/contract_001.txt", "content": "CONTRACT AGREEMENT\nParties: Company A & Vendor B\nValue: $50,000\nTerm: 12 months\nRisk Level: Medium"},
+            {"name": "reports/q4_2024_report.txt", "content": "Q4 2024 FINANCIAL REPORT\nRevenue: $1.2M\nExpenses: $800K\nProfit: $400K\nKey Metric: 15% growth"},
+            {"name": "policies/security_policy.txt", "content": "SECURITY POLICY DOCUMENT\nCompliance: ISO 27001\nLast Review: 2024-01-15\nStatus: Active"}
+        ]
+        rag_result = rag_agent.process_documents(sample_docs)
+        print(f"🧠 RAG processed {rag_result['processed_documents']} documents")
+        if rag_result["added"] or rag_result["updated"] or rag_result["removed"]:
+            rag_agent.save_snapshot(GCPConfig.RAG_SNAPSHOT_DIR)
+        return rag_result
+    
     def _generate_response(self, user_input, intent_analysis, results):
         """Generate human-readable response from results"""
         
@@ -116,7 +149,39 @@ class EnterpriseAutomationHub:
                 "next_steps": "You can ask me to analyze data, manage documents, or create reports."
             }
     
-    def get_system_status(self):
+    def record_route_feedback(self, user_input, services):
+        """Label processed requests with the services they should have used; train_router learns from these"""
+        unknown = sorted(set(services) - set(router_agent.patterns))
+        if unknown:
+            return {"success": False, "error": f"Unknown services: {unknown}"}
+        entries = [entry for entry in self.workflow_history if entry["input"] == user_input]
+        if not entries:
+            return {"success": False, "error": "No processed request with that query"}
+        for entry in entries:
+            entry["services"] = sorted(set(services))
+        routed = entries[-1]["intent"]["required_services"]
+        return {"success": True, "query": user_input, "services": entries[-1]["services"],
+                "routed_services": routed, "labeled_entries": len(entries)}
+    
+    def train_router(self, labeled_path=None):
+        """
+        Retrain the router's intent classifier from labeled workflow history (see
+        record_route_feedback) plus a labeled file, whose labels win
+        """
+        examples = dict(examples_from_history(self.workflow_history))
+        labeled_path = labeled_path or GCPConfig.ROUTER_LABELS_PATH
+        if labeled_path and os.path.exists(labeled_path):
+            examples.update(load_examples(labeled_path))
+        if not examples:
+            return {"success": False, "error": "No labeled requests to train on"}
+        
+        classifier = IntentClassifier().train(examples.items())
+        classifier.save(GCPConfig.ROUTER_MODEL_PATH)
+        router_agent.set_classifier(classifier)
+        print(f"🧠 Router classifier trained on {len(examples)} requests")
+        return {"success": True, "examples": len(examples), "labels": classifier.labels}
+    
+    def get_system_status(self, entity_limit=20, entity_offset=0):
         """Get system status - shows operational monitoring"""
         return {
             "status": "operational",
@@ -127,7 +192,11 @@ class EnterpriseAutomationHub:
                 "rag_agent": "active"
             },
             "workflows_processed": len(self.workflow_history),
-            "rag_knowledge": rag_agent.get_knowledge_summary()
+            "router_cache": router_agent.get_cache_stats(),
+            "resource_readiness": readiness.get_stats(),
+            "query_cache": query_cache.get_stats(),
+            "rag_knowledge": rag_agent.get_knowledge_summary(entity_limit, entity_offset),
+            "rag_extraction": rag_agent.get_extraction_stats()
         }
 
 # Initialize the hub
@@ -200,9 +269,47 @@ def process_query():
 @app.route('/status')
 def system_status():
     """System status endpoint - shows monitoring capabilities"""
-    status = hub.get_system_status()
+    # key_entities is paginated: /status?limit=20&offset=0
+    status = hub.get_system_status(request.args.get('limit', 20, type=int),
+                                   request.args.get('offset', 0, type=int))
     return jsonify(status)
 
+@app.route('/api/query/stream/<name>', methods=['GET', 'POST'])
+def stream_query(name):
+    """Stream a server-defined query as NDJSON - one row per line, sent page by page as it is fetched"""
+    # /api/query/stream/sample_claims?status=APPROVED&page_size=1000 - see STREAM_QUERIES
+    params = {key: value for key, value in request.values.items() if key != 'page_size'}
+    try:
+        pages = get_bigquery_server().stream_query(name, params, request.values.get('page_size', type=int))
+    except Exception as e:
+        return jsonify({"error": str(e)})
+    
+    def generate():
+        try:
+            for page in pages:
+                yield "".join(json.dumps(row, default=str) + "\n" for row in page)
+        except Exception as e:
+            # Headers are already sent, so a failure mid-stream is reported as a final line
+            yield json.dumps({"error": str(e)}) + "\n"
+    
+    return Response(generate(), mimetype="application/x-ndjson")
+
+@app.route('/api/router/feedback', methods=['POST'])
+def route_feedback():
+    """Record the services a processed query should have been routed to"""
+    # query=...&services=gcs (repeat services, or comma-separate them; leave it empty for no backend)
+    user_input = request.form.get('query', '')
+    if not user_input:
+        return jsonify({"error": "No query provided"})
+    services = [service.strip() for value in request.form.getlist('services')
+                for service in value.split(',') if service.strip()]
+    return jsonify(hub.record_route_feedback(user_input, services))
+
+@app.route('/api/train_router', methods=['POST'])
+def train_router():
+    """Retrain the router's intent classifier from labeled workflow history (and ROUTER_LABELS_PATH)"""
+    return jsonify(hub.train_router())
+
 @app.route('/api/demo')
 def run_demo():
     """Run a complete demo - showcases all capabilities"""
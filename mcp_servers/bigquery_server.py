@@ -2,26 +2,122 @@
 BigQuery MCP Server - Handles all BigQuery operations
 This demonstrates real enterprise data warehouse integration
 """
+from google.api_core.exceptions import Conflict
 from google.cloud import bigquery
+import datetime
 import json
+import threading
+import numpy as np
+from agents.numeric_columns import rollup_columns
 from configs.gcp_config import GCPConfig
+from mcp_servers.client_pool import get_bigquery_client
+from mcp_servers.query_cache import MISSING, QueryResultCache, cache_key, cacheable
+from mcp_servers.readiness import readiness
+
+try:
+    import pyarrow  # enables Arrow results, read over the BigQuery Storage API when it is installed too
+except ImportError:
+    pyarrow = None
+
+# Shared by every server in the process; see /status for hit ratio and bytes saved
+query_cache = QueryResultCache(GCPConfig.QUERY_CACHE_MAX_BYTES, GCPConfig.QUERY_CACHE_TTL)
+
+# Python type -> BigQuery parameter type (bool before int, datetime before date)
+PARAMETER_TYPES = [
+    (bool, "BOOL"), (int, "INT64"), (float, "FLOAT64"),
+    (datetime.datetime, "TIMESTAMP"), (datetime.date, "DATE"), (str, "STRING")
+]
+
+def _parameter_type(value):
+    return next((type_name for python_type, type_name in PARAMETER_TYPES if isinstance(value, python_type)), "STRING")
+
+# Server-defined queries that may be streamed: callers choose one by name and can only
+# supply its declared @parameters (unset ones are NULL); {table} is the sample claims table
+STREAM_QUERIES = {
+    "sample_claims": {
+        "sql": """
+        SELECT claim_id, amount, status, customer_id, date_submitted
+        FROM `{table}`
+        WHERE (@status IS NULL OR status = @status)
+          AND (@customer_id IS NULL OR customer_id = @customer_id)
+        ORDER BY date_submitted, claim_id
+        """,
+        "params": {"status": "STRING", "customer_id": "STRING"}
+    },
+    "claim_analytics": {
+        "sql": """
+        SELECT status, COUNT(*) as claim_count, AVG(amount) as avg_amount, SUM(amount) as total_amount
+        FROM `{table}`
+        GROUP BY status
+        """,
+        "params": {}
+    }
+}
+
+# BigQuery field type -> NumPy dtype for columns built from REST pages; other types stay object arrays
+COLUMN_DTYPES = {
+    "FLOAT": np.float64, "FLOAT64": np.float64, "NUMERIC": np.float64, "BIGNUMERIC": np.float64,
+    "INTEGER": np.int64, "INT64": np.int64, "BOOLEAN": np.bool_, "BOOL": np.bool_
+}
+
+def query_parameters(params):
+    """Named query parameters (@name in SQL) from {name: value}; lists become ARRAY parameters"""
+    parameters = []
+    for name, value in params.items():
+        if isinstance(value, (list, tuple)):
+            parameters.append(bigquery.ArrayQueryParameter(
+                name, _parameter_type(value[0]) if value else "STRING", list(value)))
+        else:
+            parameters.append(bigquery.ScalarQueryParameter(name, _parameter_type(value), value))
+    return parameters
+
+SAMPLE_CLAIMS_SCHEMA = [
+    bigquery.SchemaField("claim_id", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("amount", "FLOAT", mode="REQUIRED"),
+    bigquery.SchemaField("status", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("customer_id", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("date_submitted", "DATE", mode="REQUIRED"),
+]
+
+SAMPLE_CLAIMS_ROWS = [
+    {"claim_id": "CLM001", "amount": 1500.0, "status": "APPROVED", "customer_id": "CUST001", "date_submitted": "2024-01-15"},
+    {"claim_id": "CLM002", "amount": 2750.0, "status": "PENDING", "customer_id": "CUST002", "date_submitted": "2024-01-16"},
+    {"claim_id": "CLM003", "amount": 500.0, "status": "REJECTED", "customer_id": "CUST001", "date_submitted": "2024-01-17"},
+]
 
 class BigQueryMCPServer:
-    def __init__(self):
-        # BigQuery client automatically uses Cloud Shell credentials
-        self.client = bigquery.Client(project=GCPConfig.PROJECT_ID)
+    def __init__(self, client=None):
+        # BigQuery client automatically uses Cloud Shell credentials; the pooled one unless given
+        self._client = client
         print(f"✅ BigQuery MCP Server initialized for project: {GCPConfig.PROJECT_ID}")
     
-    def run_query(self, sql):
+    @property
+    def client(self):
+        return self._client or get_bigquery_client()
+    
+    def run_query(self, sql, params=None, use_cache=True):
         """Execute SQL query - showcases data analysis capabilities"""
         try:
             print(f"📊 Executing query: {sql}")
-            query_job = self.client.query(sql)
+            key = cache_key(sql, params)
+            use_cache = use_cache and cacheable(sql)
+            if use_cache:
+                rows = query_cache.get(key, self._table_modified)
+                if rows is not MISSING:
+                    print(f"⚡ Query cache hit: {len(rows)} rows")
+                    return {"success": True, "data": [dict(row) for row in rows], "row_count": len(rows),
+                            "cached": True}
+            
+            job_config = bigquery.QueryJobConfig(query_parameters=query_parameters(params)) if params else None
+            query_job = self.client.query(sql, job_config=job_config)
             results = []
             
             for row in query_job:
                 results.append(dict(row))
             
+            if use_cache and query_job.statement_type == "SELECT":
+                self._cache_results(key, query_job, results)
+            
             print(f"✅ Query returned {len(results)} rows")
             return {"success": True, "data": results, "row_count": len(results)}
             
@@ -30,6 +126,98 @@ class BigQueryMCPServer:
             print(error_msg)
             return {"success": False, "error": error_msg}
     
+    def stream_query(self, name, params=None, page_size=None):
+        """
+        Start one of the STREAM_QUERIES and return a generator of row pages (lists of dicts).
+        Pages are fetched from the job one at a time, so memory stays bounded by page_size
+        whatever the row count. Unknown queries or parameters raise ValueError.
+        """
+        if name not in STREAM_QUERIES:
+            raise ValueError(f"Unknown stream query: {name}")
+        template = STREAM_QUERIES[name]
+        params = params or {}
+        unknown = sorted(set(params) - set(template["params"]))
+        if unknown:
+            raise ValueError(f"Unknown parameters for {name}: {unknown}")
+        parameters = [bigquery.ScalarQueryParameter(param, type_name, params.get(param))
+                      for param, type_name in template["params"].items()]
+        
+        sql = template["sql"].format(table=self._ensure_sample_table())
+        print(f"📊 Streaming query: {name}")
+        query_job = self.client.query(sql, job_config=bigquery.QueryJobConfig(query_parameters=parameters))
+        rows = query_job.result(page_size=page_size or GCPConfig.QUERY_PAGE_SIZE)
+        return ([dict(row) for row in page] for page in rows.pages)
+    
+    def run_query_columns(self, sql, params=None):
+        """
+        Execute SQL and return {column: NumPy array} instead of row dicts. With pyarrow the
+        result is read as Arrow record batches (over the BigQuery Storage API when
+        google-cloud-bigquery-storage is installed); otherwise arrays are built per page
+        from the REST rows. Nulls become NaN in numeric columns.
+        """
+        try:
+            print(f"📊 Executing columnar query: {sql}")
+            job_config = bigquery.QueryJobConfig(query_parameters=query_parameters(params)) if params else None
+            rows = self.client.query(sql, job_config=job_config).result()
+            
+            if pyarrow is not None:
+                table = rows.to_arrow(create_bqstorage_client=True)
+                columns = {name: table.column(name).to_numpy() for name in table.column_names}
+            else:
+                columns = self._rest_columns(rows)
+            
+            row_count = len(next(iter(columns.values()))) if columns else 0
+            print(f"✅ Query returned {row_count} rows in {len(columns)} columns")
+            return {"success": True, "columns": columns, "row_count": row_count}
+        
+        except Exception as e:
+            error_msg = f"❌ Query failed: {str(e)}"
+            print(error_msg)
+            return {"success": False, "error": error_msg}
+    
+    def _rest_columns(self, rows):
+        fields = list(rows.schema)
+        pages = {field.name: [] for field in fields}
+        for page in rows.pages:
+            values = [row.values() for row in page]
+            for position, field in enumerate(fields):
+                column = [row[position] for row in values]
+                dtype = COLUMN_DTYPES.get(field.field_type, object)
+                if dtype is not np.float64 and None in column:
+                    dtype = np.float64 if dtype is np.int64 else object
+                pages[field.name].append(np.array(column, dtype=dtype))
+        return {name: np.concatenate(chunks) if chunks else np.zeros(0) for name, chunks in pages.items()}
+    
+    def rollup_query(self, sql, value, group_by=None, params=None):
+        """Sum/avg/min/max/percentiles of a result column per group, aggregated in NumPy over the columnar result"""
+        result = self.run_query_columns(sql, params)
+        if not result["success"]:
+            return result
+        try:
+            groups = rollup_columns(result["columns"], value, group_by)
+        except (TypeError, ValueError) as e:
+            return {"success": False, "error": str(e)}
+        return {"success": True, "value": value, "group_by": group_by, "row_count": result["row_count"],
+                "groups": groups}
+    
+    def _table_modified(self, table_id):
+        return self.client.get_table(table_id).modified
+    
+    def _cache_results(self, key, query_job, rows):
+        """Cache rows with their tables' versions - unless a table changed after the query started"""
+        tables = {}
+        try:
+            for reference in query_job.referenced_tables:
+                table_id = f"{reference.project}.{reference.dataset_id}.{reference.table_id}"
+                modified = self._table_modified(table_id)
+                if modified is None or (query_job.started is not None and modified >= query_job.started):
+                    return
+                tables[table_id] = modified
+        except Exception as e:
+            print(f"⚠️  Query not cached: {str(e)}")
+            return
+        query_cache.put(key, [dict(row) for row in rows], tables)
+    
     def list_datasets(self):
         """List all datasets in the project - shows data discovery"""
         try:
@@ -43,73 +231,84 @@ class BigQueryMCPServer:
     def create_sample_table(self):
         """Create a sample table for demonstration - shows schema management"""
         try:
-            dataset_ref = f"{GCPConfig.PROJECT_ID}.{GCPConfig.DATASET_ID}"
-            
-            # Create dataset if it doesn't exist
-            dataset = bigquery.Dataset(dataset_ref)
-            dataset.location = "US"
-            self.client.create_dataset(dataset, exists_ok=True)
-            print(f"✅ Dataset {GCPConfig.DATASET_ID} ready")
-            
-            # Create sample table
-            table_id = f"{dataset_ref}.sample_claims"
-            schema = [
-                bigquery.SchemaField("claim_id", "STRING", mode="REQUIRED"),
-                bigquery.SchemaField("amount", "FLOAT", mode="REQUIRED"),
-                bigquery.SchemaField("status", "STRING", mode="REQUIRED"),
-                bigquery.SchemaField("customer_id", "STRING", mode="REQUIRED"),
-                bigquery.SchemaField("date_submitted", "DATE", mode="REQUIRED"),
-            ]
-            
-            table = bigquery.Table(table_id, schema=schema)
-            self.client.create_table(table, exists_ok=True)
-            print(f"✅ Table sample_claims created")
-            
-            # Insert sample data
-            rows_to_insert = [
-                {"claim_id": "CLM001", "amount": 1500.0, "status": "APPROVED", "customer_id": "CUST001", "date_submitted": "2024-01-15"},
-                {"claim_id": "CLM002", "amount": 2750.0, "status": "PENDING", "customer_id": "CUST002", "date_submitted": "2024-01-16"},
-                {"claim_id": "CLM003", "amount": 500.0, "status": "REJECTED", "customer_id": "CUST001", "date_submitted": "2024-01-17"},
-            ]
-            
-            errors = self.client.insert_rows_json(table_id, rows_to_insert)
-            if errors:
-                print(f"❌ Error inserting data: {errors}")
-                return {"success": False, "error": str(errors)}
-            
-            print("✅ Sample table created with demo data")
+            self._ensure_sample_table()
             return {"success": True, "message": "Sample table created successfully"}
-            
         except Exception as e:
             print(f"❌ Error creating sample table: {str(e)}")
             return {"success": False, "error": str(e)}
     
+    def _ensure_sample_table(self):
+        """Dataset, table and demo rows - each checked once per READINESS_TTL"""
+        dataset_ref = f"{GCPConfig.PROJECT_ID}.{GCPConfig.DATASET_ID}"
+        table_id = f"{dataset_ref}.sample_claims"
+        readiness.ensure(("bq_dataset", dataset_ref), lambda: self._create_dataset(dataset_ref))
+        readiness.ensure(("bq_table", table_id), lambda: self._seed_sample_table(table_id))
+        return table_id
+    
+    def _create_dataset(self, dataset_ref):
+        # Create dataset if it doesn't exist
+        dataset = bigquery.Dataset(dataset_ref)
+        dataset.location = "US"
+        self.client.create_dataset(dataset, exists_ok=True)
+        print(f"✅ Dataset {GCPConfig.DATASET_ID} ready")
+    
+    def _seed_sample_table(self, table_id):
+        """Create the table and load the demo rows only into an empty table, so re-seeding never duplicates"""
+        table = self.client.create_table(bigquery.Table(table_id, schema=SAMPLE_CLAIMS_SCHEMA), exists_ok=True)
+        if table.num_rows:
+            print(f"✅ Table sample_claims ready")
+            return
+        
+        # WRITE_EMPTY fails if a concurrent seeder already loaded the rows
+        job_config = bigquery.LoadJobConfig(schema=SAMPLE_CLAIMS_SCHEMA,
+                                            write_disposition=bigquery.WriteDisposition.WRITE_EMPTY)
+        try:
+            self.client.load_table_from_json(SAMPLE_CLAIMS_ROWS, table_id, job_config=job_config).result()
+            print("✅ Sample table created with demo data")
+        except Conflict:
+            print(f"✅ Table sample_claims ready")
+    
     def get_claim_analytics(self):
         """Get analytics on claims data - shows business intelligence capabilities"""
-        # First ensure the table exists
-        self.create_sample_table()
+        # First ensure the table exists (cached, so the hot path is just the query)
+        try:
+            table_id = self._ensure_sample_table()
+        except Exception as e:
+            print(f"❌ Error creating sample table: {str(e)}")
+            return {"success": False, "error": str(e)}
         
-        query = f"""
-        SELECT 
-            status,
-            COUNT(*) as claim_count,
-            AVG(amount) as avg_amount,
-            SUM(amount) as total_amount
-        FROM `{GCPConfig.PROJECT_ID}.{GCPConfig.DATASET_ID}.sample_claims`
-        GROUP BY status
-        """
-        return self.run_query(query)
+        result = self.run_query(STREAM_QUERIES["claim_analytics"]["sql"].format(table=table_id))
+        if not result["success"]:
+            # The dataset or table may have been dropped; re-check them on the next call
+            readiness.invalidate(("bq_dataset", table_id.rsplit(".", 1)[0]))
+            readiness.invalidate(("bq_table", table_id))
+        return result
+
+_server = None
+_server_lock = threading.Lock()
+
+def get_server():
+    """Process-wide server over the pooled client"""
+    global _server
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                _server = BigQueryMCPServer()
+    return _server
 
 def handle_bigquery_request(method, params=None):
     """Handle BigQuery requests with proper parameter handling"""
-    server = BigQueryMCPServer()
+    server = get_server()
     
     # Ensure params is always a dictionary
     if params is None:
         params = {}
     
     if method == "run_query":
-        return server.run_query(params.get("sql", "SELECT 1"))
+        return server.run_query(params.get("sql", "SELECT 1"), params.get("params"), params.get("use_cache", True))
+    elif method == "rollup_query":
+        return server.rollup_query(params.get("sql", "SELECT 1"), params.get("value", ""), params.get("group_by"),
+                                   params.get("params"))
     elif method == "list_datasets":
         return server.list_datasets()
     elif method == "create_sample_table":
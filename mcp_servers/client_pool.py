@@ -0,0 +1,88 @@
+"""
+Client Pool - Process-wide Google Cloud clients shared by the MCP servers
+Each client is created once, on first use, and keeps one authorized HTTP session
+whose connection pool is sized from GCPConfig. Actions reuse its credentials and
+keep-alive connections instead of paying auth and TLS setup on every call.
+"""
+import atexit
+import threading
+import time
+
+from google.cloud import bigquery, storage
+from requests.adapters import HTTPAdapter
+
+from configs.gcp_config import GCPConfig
+
+CLIENT_FACTORIES = {
+    "bigquery": lambda: bigquery.Client(project=GCPConfig.PROJECT_ID),
+    "storage": lambda: storage.Client(project=GCPConfig.PROJECT_ID)
+}
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_client(service):
+    """Shared client for "bigquery" or "storage", created on first use (thread-safe)"""
+    client = _clients.get(service)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(service)
+        if client is None:
+            client = CLIENT_FACTORIES[service]()
+            # Size the keep-alive pool for concurrent actions; the default of 10 drops connections under load
+            adapter = HTTPAdapter(pool_connections=GCPConfig.HTTP_POOL_CONNECTIONS,
+                                  pool_maxsize=GCPConfig.HTTP_POOL_MAXSIZE)
+            client._http.mount("https://", adapter)
+            _clients[service] = client
+            print(f"🔌 Pooled {service} client ready (pool size {GCPConfig.HTTP_POOL_MAXSIZE})")
+    return client
+
+
+def get_bigquery_client():
+    return get_client("bigquery")
+
+
+def get_storage_client():
+    return get_client("storage")
+
+
+def shutdown():
+    """Close every pooled client and its HTTP connections; the next get_client() starts fresh"""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+atexit.register(shutdown)
+
+
+def benchmark_client_reuse(iterations=20):
+    """Per-action latency of list_datasets / list_files with fresh servers versus pooled ones"""
+    from mcp_servers.bigquery_server import BigQueryMCPServer, handle_bigquery_request
+    from mcp_servers.gcs_server import GCSMCPServer, handle_gcs_request
+
+    def per_action_ms(action):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            action()
+        return round((time.perf_counter() - start) / iterations * 1000, 2)
+
+    fresh = {
+        "bigquery": per_action_ms(lambda: BigQueryMCPServer(CLIENT_FACTORIES["bigquery"]()).list_datasets()),
+        "gcs": per_action_ms(lambda: GCSMCPServer(CLIENT_FACTORIES["storage"]()).list_files())
+    }
+    handle_bigquery_request("list_datasets")   # warm the pool outside the timed loop
+    handle_gcs_request("list_files")
+    pooled = {
+        "bigquery": per_action_ms(lambda: handle_bigquery_request("list_datasets")),
+        "gcs": per_action_ms(lambda: handle_gcs_request("list_files"))
+    }
+    return {"iterations": iterations, "fresh_client_ms": fresh, "pooled_client_ms": pooled}
+
+
+if __name__ == "__main__":
+    print(benchmark_client_reuse())
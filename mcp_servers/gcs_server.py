@@ -2,31 +2,45 @@
 GCS MCP Server - Handles cloud storage operations
 Demonstrates file management and document storage capabilities
 """
-from google.cloud import storage
+from google.api_core.exceptions import Conflict
 import json
+import threading
 from configs.gcp_config import GCPConfig
+from mcp_servers.client_pool import get_storage_client
+from mcp_servers.readiness import readiness
 
 class GCSMCPServer:
-    def __init__(self):
-        self.client = storage.Client(project=GCPConfig.PROJECT_ID)
+    def __init__(self, client=None):
+        self._client = client
         self.bucket_name = GCPConfig.BUCKET_NAME
         self._ensure_bucket_exists()
         print(f"✅ GCS MCP Server initialized. Bucket: {self.bucket_name}")
     
+    @property
+    def client(self):
+        return self._client or get_storage_client()
+    
     def _ensure_bucket_exists(self):
-        """Create bucket if it doesn't exist - shows infrastructure management"""
+        """Create bucket if it doesn't exist - checked once per READINESS_TTL, not on every request"""
         try:
-            bucket = self.client.bucket(self.bucket_name)
-            if not bucket.exists():
-                bucket = self.client.create_bucket(self.bucket_name, location="us")
-                print(f"✅ Created new bucket: {self.bucket_name}")
-            else:
-                print(f"✅ Using existing bucket: {self.bucket_name}")
+            readiness.ensure(("gcs_bucket", self.bucket_name), self._create_bucket_if_missing)
         except Exception as e:
             print(f"⚠️  Bucket setup: {str(e)}")
     
+    def _create_bucket_if_missing(self):
+        bucket = self.client.bucket(self.bucket_name)
+        if bucket.exists():
+            print(f"✅ Using existing bucket: {self.bucket_name}")
+            return
+        try:
+            self.client.create_bucket(self.bucket_name, location="us")
+            print(f"✅ Created new bucket: {self.bucket_name}")
+        except Conflict:
+            print(f"✅ Using existing bucket: {self.bucket_name}")  # created concurrently
+    
     def list_files(self, prefix=""):
         """List files in bucket - shows document discovery"""
+        self._ensure_bucket_exists()
         try:
             bucket = self.client.bucket(self.bucket_name)
             blobs = bucket.list_blobs(prefix=prefix)
@@ -36,6 +50,7 @@ class GCSMCPServer:
                 files.append({
                     "name": blob.name,
                     "size": blob.size,
+                    "generation": blob.generation,
                     "updated": blob.updated.isoformat() if blob.updated else None
                 })
             
@@ -47,6 +62,7 @@ class GCSMCPServer:
     
     def upload_file(self, file_name, content):
         """Upload file to GCS - shows document ingestion"""
+        self._ensure_bucket_exists()
         try:
             bucket = self.client.bucket(self.bucket_name)
             blob = bucket.blob(file_name)
@@ -90,9 +106,21 @@ class GCSMCPServer:
         
         return {"success": True, "uploaded_files": results}
 
+_server = None
+_server_lock = threading.Lock()
+
+def get_server():
+    """Process-wide server over the pooled client; the bucket check runs once, not per action"""
+    global _server
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                _server = GCSMCPServer()
+    return _server
+
 def handle_gcs_request(method, params=None):
     """Handle GCS requests with proper parameter handling"""
-    server = GCSMCPServer()
+    server = get_server()
     
     # Ensure params is always a dictionary
     if params is None:
@@ -0,0 +1,125 @@
+"""
+Query Cache - Local result cache for repeated BigQuery SELECTs
+Entries are keyed by normalized SQL plus query parameters, bounded by an
+estimate of their size in bytes with LRU eviction, and dropped after a TTL or
+as soon as a referenced table's "modified" timestamp differs from the one
+recorded with the result (one metadata lookup per table on a hit).
+"""
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+# Quoted strings and identifiers are kept verbatim; whitespace elsewhere collapses to one space
+SQL_TOKEN = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`)|\s+""")
+
+# Results of these change without any table changing, so they are never cached
+NONDETERMINISTIC_SQL = re.compile(r"\b(?:CURRENT_\w+|RAND|GENERATE_UUID|SESSION_USER|NOW)\s*\(", re.IGNORECASE)
+
+
+def normalize_sql(sql):
+    normalized = SQL_TOKEN.sub(lambda match: match.group(1) or " ", sql).strip()
+    return normalized.rstrip(";").rstrip()
+
+
+def cache_key(sql, params=None):
+    return normalize_sql(sql), json.dumps(params, sort_keys=True, default=str) if params else None
+
+
+def cacheable(sql):
+    return NONDETERMINISTIC_SQL.search(sql) is None
+
+
+class QueryResultCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl_seconds=300):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()   # key -> (expires_at, rows, table versions, size)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0   # entries dropped because a referenced table changed
+        self.expirations = 0
+        self.evictions = 0
+        self.bytes_saved = 0     # result bytes served from the cache instead of BigQuery
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[3]
+
+    def get(self, key, table_modified):
+        """
+        Cached rows or MISSING. table_modified(table_id) returns a table's current
+        "modified" timestamp; any change from the recorded one invalidates the entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+        expires_at, rows, tables, size = entry
+        try:
+            changed = any(table_modified(table_id) != modified for table_id, modified in tables.items())
+        except Exception:
+            changed = True   # e.g. the table was dropped
+
+        with self._lock:
+            if changed:
+                if self._entries.get(key) is entry:
+                    self._drop(key)
+                self.invalidations += 1
+                self.misses += 1
+                return MISSING
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += size
+        return rows
+
+    def put(self, key, rows, tables):
+        """Cache rows with the {table_id: modified} versions they were read from"""
+        size = len(json.dumps(rows, default=str))
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (expires_at, rows, dict(tables), size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "invalidations": self.invalidations,
+            "expirations": self.expirations,
+            "evictions": self.evictions
+        }
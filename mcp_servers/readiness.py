@@ -0,0 +1,56 @@
+"""
+Readiness Registry - Remembers which cloud resources are known to exist
+Buckets, datasets and seeded tables are checked (and created if missing) once,
+then trusted for a TTL, so hot-path requests skip the existence round trips.
+Shared by the GCS and BigQuery servers.
+"""
+import threading
+import time
+
+from configs.gcp_config import GCPConfig
+
+
+class ReadinessRegistry:
+    def __init__(self, ttl_seconds=600):
+        self.ttl_seconds = ttl_seconds
+        self._ready = {}   # resource key -> monotonic time the confirmation expires
+        self._locks = {}   # resource key -> lock, so only one check per resource is in flight
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.hits = 0
+
+    def _fresh(self, key):
+        expires_at = self._ready.get(key)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def ensure(self, key, check):
+        """
+        Run check() - an idempotent create-if-missing - unless key was confirmed within
+        the TTL. Exceptions from check() propagate and nothing is cached.
+        """
+        if self._fresh(key):
+            self.hits += 1
+            return
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if self._fresh(key):   # another thread confirmed it while we waited
+                self.hits += 1
+                return
+            self.checks += 1
+            check()
+            self._ready[key] = time.monotonic() + self.ttl_seconds
+
+    def invalidate(self, key=None):
+        """Forget one resource (e.g. after a NotFound), or all of them"""
+        if key is None:
+            self._ready.clear()
+        else:
+            self._ready.pop(key, None)
+
+    def get_stats(self):
+        return {"ready": sorted(str(key) for key in self._ready if self._fresh(key)),
+                "ttl_seconds": self.ttl_seconds, "checks": self.checks, "hits": self.hits}
+
+
+readiness = ReadinessRegistry(GCPConfig.READINESS_TTL)